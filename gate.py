@@ -13,6 +13,8 @@ class Gate:
         self.flicker_color = (255, 255, 255)  # Default color: white
         self.cage_rect = pygame.Rect(180, 220, 160, 100)
         self.gate_rect = pygame.Rect(self.cage_rect.left + 60, self.cage_rect.bottom - 5, 40, 5)
+        # The gate never moves, so its tile is worked out once
+        self.tile = (self.gate_rect.centerx // tile_size, self.gate_rect.centery // tile_size)
 
 
     def hit(self):
@@ -30,9 +32,8 @@ class Gate:
             
     def break_gate(self):
         self.broken = True
-        gate_tile_x = self.gate_rect.centerx // self.tile_size
-        gate_tile_y = self.gate_rect.centery // self.tile_size
-        self.maze[gate_tile_y][gate_tile_x] = 0  # Make tile walkable
+        gate_tile_x, gate_tile_y = self.tile
+        self.maze.set(gate_tile_x, gate_tile_y, 0)  # Make tile walkable, bumps the maze version
 
     def start_flicker(self):
         """Start the flickering effect."""
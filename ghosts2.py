@@ -1,12 +1,93 @@
+import copy
 import pygame
 import random
-from search_agents import bfs, astar, minimax_choose_move, minimax_get_possible_moves, GeneticGhostAI, calculate_fitness
+from search_agents import bfs, astar, IncrementalAStar, MCTSPlanner, minimax_choose_move, minimax_get_possible_moves, GeneticGhostAI, batch_fitness
+from policy import find_policy
+from pursuit import pursuit_table
+from maze import nearest_open_tiles
 
 # Constants for genetic algorithm
 DIRECTIONS = ['up', 'down', 'left', 'right']
 
+# Trained policies (.pmp files written by train_genetic_algorithm.py)
+POLICY_DIR = 'policies'
+
+# Ghosts that keep their search tree between replans (Pinky). Blinky steps along the
+# shared flow fields instead; listing it here makes it search with its own tree again
+INCREMENTAL_GHOSTS = {1}
+
+# Ghosts that use Monte Carlo tree search instead of their own algorithm, e.g. {3}
+MCTS_GHOSTS = set()
+
+# Ghosts that play the offline-solved optimal pursuit table (see pursuit.py), e.g. {2}
+OPTIMAL_GHOSTS = set()
+
+# State plan() builds up across calls; background jobs hand it back with their path
+PLAN_STATE = ('planner', 'mcts', 'genetic_ai')
+
+class PathFollower:
+    """A planned path of tiles with a cursor, so taking a step is O(1).
+
+    `target` is the Pac-Man tile the path was planned against and `chased`
+    that Pac-Man's index in the positions the ghost is given. A path is
+    kept while it stays walkable and that Pac-Man stays within a few tiles
+    of it, instead of being replanned every time it runs out or the maze
+    is regenerated.
+    """
+    def __init__(self, steps=(), target=None, chased=None):
+        self.set(steps, target, chased)
+
+    def set(self, steps, target=None, chased=None):
+        self.steps = list(steps) if steps else []
+        self.cursor = 0
+        self.target = target
+        self.chased = chased
+
+    def clear(self):
+        self.set(())
+
+    def __len__(self):
+        return len(self.steps) - self.cursor
+
+    def __getitem__(self, index):
+        """Remaining steps by position: [0] is the next tile, [-1] the last"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("path index out of range")
+        return self.steps[self.cursor + index]
+
+    def remaining(self):
+        return self.steps[self.cursor:]
+
+    def advance(self):
+        """Step past the next tile"""
+        self.cursor += 1
+
+    def extend(self, steps):
+        self.steps = self.steps[self.cursor:] + list(steps)
+        self.cursor = 0
+
+    def is_valid(self, start, walkable):
+        """True if the remaining steps still form a walkable chain of tiles from start"""
+        previous = start
+        for step in self.remaining():
+            if abs(step[0] - previous[0]) + abs(step[1] - previous[1]) != 1 or not walkable(step[0], step[1]):
+                return False
+            previous = step
+        return True
+
+    def drifted(self, pacman_positions, threshold):
+        """True if the chased Pac-Man is more than `threshold` tiles from where the path was planned against it"""
+        if self.target is None or self.chased is None:
+            return False
+        x, y = pacman_positions[self.chased]
+        return abs(x - self.target[0]) + abs(y - self.target[1]) > threshold
+
+
 class Ghost:
-    def __init__(self, id, x, y, frames, tile_size, maze, gate):
+    def __init__(self, id, x, y, frames, tile_size, maze, gate, distance_table=None, flow_fields=None,
+                 team_planner=None):
         self.id = id
         self.x = x
         self.y = y
@@ -15,6 +96,9 @@ class Ghost:
         self.rect = pygame.Rect(self.x * tile_size, self.y * tile_size, tile_size, tile_size)
         self.maze = maze
         self.gate = gate
+        self.distance_table = distance_table  # Precomputed maze distances, if available
+        self.flow_fields = flow_fields  # Shared distance fields toward each Pac-Man
+        self.team_planner = team_planner  # Joint search for all ghosts, if team mode is on
 
         self.has_escaped = False
         self.bump_count = 0
@@ -26,31 +110,48 @@ class Ghost:
         self.move_timer = 0
         self.can_move = True
         self.alive = True
-        self.path = []  # Store current path
+        self.path = PathFollower()  # Current path, and the Pac-Man tile it was planned against
+        self.replan_distance = 3  # Replan once that Pac-Man is this many tiles away from it
+        self.search_stats = {}  # A* searches and nodes expanded, for profiling
+        self.incremental = id in INCREMENTAL_GHOSTS
+        self.planner = None  # IncrementalAStar, created on first replan
+        self.minimax_budget = 0.02  # Seconds per Clyde decision; deepening stops here
+        self.use_mcts = id in MCTS_GHOSTS
+        self.mcts = None  # MCTSPlanner, created on first decision
+        self.mcts_budget = 0.02  # Seconds of rollouts per MCTS decision
+        self.use_optimal = id in OPTIMAL_GHOSTS
+        self.genetic = id == 4 and not self.use_mcts and not self.use_optimal  # Inky's evolving population
+        self.genetic_budget_us = 300  # Microseconds of evolution per frame for Inky
+        self.plan_epoch = 0  # Bumped by reset and update_maze so older background plans are dropped
 
-        self.trained_path = []
-        if self.id == 4:
-            try:
-                with open("trained_clyde_path.txt", "r") as f:
-                    self.trained_path = eval(f.read())
-            except FileNotFoundError:
-                print("Trained path not found. Using smart movement.")
-
-    def update_maze(self, new_maze):
-        """Update maze and handle collisions/pellets"""
+        # Trained plan that seeds Inky's population; cached, so resets do no file I/O
+        self.policy = find_policy(POLICY_DIR, self.id, maze) if self.id == 4 else None
+
+    def update_maze(self, new_maze, distance_table=None, tile=None):
+        """Update maze and handle collisions/pellets.
+
+        A ghost walled in by the new layout moves to `tile`, or to its
+        nearest open tile when none is given.
+        """
         self.maze = new_maze
-        # Clear current path to force recalculation with new maze
-        self.path = []
+        self.distance_table = distance_table
+        # Search trees belong to the old layout; the path is checked below
+        self.planner = None
+        self.mcts = None
+        self.plan_epoch += 1
+        if self.id == 4:
+            self.policy = find_policy(POLICY_DIR, self.id, new_maze)
         # Verify current position is still valid
         current_pos = self.tile_position()
         if not self.is_walkable(current_pos[0], current_pos[1]):
-            # Find nearest walkable position
-            for y in range(len(self.maze)):
-                for x in range(len(self.maze[0])):
-                    if self.is_walkable(x, y):
-                        self.rect.centerx = x * self.tile_size + self.tile_size // 2
-                        self.rect.centery = y * self.tile_size + self.tile_size // 2
-                        break
+            if tile is None:
+                tile = nearest_open_tiles(new_maze).nearest_to(current_pos)
+            if tile is not None:
+                self.rect.center = (tile[0] * self.tile_size + self.tile_size // 2,
+                                    tile[1] * self.tile_size + self.tile_size // 2)
+        # Keep the current path if it still runs through open tiles
+        if not self.path.is_valid(self.tile_position(), self.is_walkable):
+            self.path.clear()
 
     def tile_position(self):
         """Get current tile coordinates based on center position"""
@@ -58,27 +159,32 @@ class Ghost:
                 round(self.rect.centery / self.tile_size))
 
     def draw(self, surface):
+        # Frames come pre-scaled from load_sprite_sheet(tile_size); smaller ones are centred
         sprite = self.frames[self.direction_name][self.current_frame]
-        sprite = pygame.transform.scale(sprite, (self.tile_size, self.tile_size))
-        surface.blit(sprite, self.rect.topleft)
+        offset = (self.tile_size - sprite.get_width()) // 2
+        surface.blit(sprite, (self.rect.left + offset, self.rect.top + offset))
 
     def is_walkable(self, x, y):
         """Check if a tile is walkable"""
-        if x < 0 or y < 0 or x >= len(self.maze[0]) or y >= len(self.maze):
+        if not self.maze.in_bounds(x, y):
             return False
             
-        # Get gate tile position
-        gate_tile = (self.gate.gate_rect.centerx // self.tile_size, 
-                    self.gate.gate_rect.centery // self.tile_size)
-        
         # Allow ghosts to pass through gate tiles
-        if (x, y) == gate_tile:
+        if (x, y) == self.gate.tile:
             return True
             
-        return self.maze[y][x] != 1  # 1 means wall, anything else is walkable
+        return self.maze.is_open(x, y)  # 1 means wall, anything else is walkable
+
+    def maze_distance(self, a, b):
+        """Walking distance from the distance table, Manhattan distance as fallback"""
+        if self.distance_table is not None:
+            dist = self.distance_table.distance(a, b)
+            if dist is not None:
+                return dist
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
-    def update(self, ghosts, pacman_positions):
-        """Update ghost state and movement"""
+    def update(self, ghosts, pacman_positions, scheduler=None, workers=None):
+        """Update ghost state and movement; planning goes through `workers` or `scheduler` if given"""
         if not self.alive:
             return
 
@@ -96,12 +202,11 @@ class Ghost:
         if not self.has_escaped:
             self.escape_cage()
         else:
-            self.chase_pacman(pacman_positions, ghosts)
+            self.chase_pacman(pacman_positions, ghosts, scheduler, workers)
 
     def escape_cage(self):
         """Escape logic with improved movement"""
-        gate_tile = (self.gate.gate_rect.centerx // self.tile_size, 
-                    self.gate.gate_rect.centery // self.tile_size)
+        gate_tile = self.gate.tile
 
         # Attack gate if not broken
         if not self.gate.broken:
@@ -114,7 +219,7 @@ class Ghost:
         # Use A* to find path to gate
         current_pos = self.tile_position()
         if not self.path:
-            self.path = astar(current_pos, gate_tile, self.maze)
+            self.path.set(astar(current_pos, gate_tile, self.maze, self.search_stats))
             if not self.path:
                 # If no path found, try direct movement
                 dx = gate_tile[0] - current_pos[0]
@@ -147,7 +252,7 @@ class Ghost:
             if (abs(self.rect.centerx - target_x) < self.speed and 
                 abs(self.rect.centery - target_y) < self.speed):
                 self.rect.center = (target_x, target_y)
-                self.path.pop(0)
+                self.path.advance()
                 
                 # Check if reached gate
                 if self.tile_position() == gate_tile and self.gate.broken:
@@ -158,12 +263,8 @@ class Ghost:
         """Each ghost targets a specific Pacman with improved targeting after kills"""
         # Handle dead pacman cases
         if player1_pos == (-1, -1) and player2_pos == (-1, -1):
-            # Both Pacmans are dead, choose random walkable position
-            walkable_positions = []
-            for y in range(len(self.maze)):
-                for x in range(len(self.maze[0])):
-                    if self.is_walkable(x, y):
-                        walkable_positions.append((x, y))
+            # Both Pacmans are dead, choose random walkable position (cached per maze version)
+            walkable_positions = self.maze.open_tiles()
             return random.choice(walkable_positions) if walkable_positions else current_pos
 
         # Each ghost has a specific targeting strategy
@@ -192,8 +293,8 @@ class Ghost:
             if player2_pos == (-1, -1):
                 return player1_pos
             # If both alive, target the Pacman that's further away
-            dist_to_p1 = abs(current_pos[0] - player1_pos[0]) + abs(current_pos[1] - player1_pos[1])
-            dist_to_p2 = abs(current_pos[0] - player2_pos[0]) + abs(current_pos[1] - player2_pos[1])
+            dist_to_p1 = self.maze_distance(current_pos, player1_pos)
+            dist_to_p2 = self.maze_distance(current_pos, player2_pos)
             return player1_pos if dist_to_p1 >= dist_to_p2 else player2_pos
 
         elif self.id == 4:  # Inky - uses Genetic Algorithm
@@ -203,44 +304,169 @@ class Ghost:
             if player2_pos == (-1, -1):
                 return player1_pos
             # If both alive, target the Pacman that's closer
-            dist_to_p1 = abs(current_pos[0] - player1_pos[0]) + abs(current_pos[1] - player1_pos[1])
-            dist_to_p2 = abs(current_pos[0] - player2_pos[0]) + abs(current_pos[1] - player2_pos[1])
+            dist_to_p1 = self.maze_distance(current_pos, player1_pos)
+            dist_to_p2 = self.maze_distance(current_pos, player2_pos)
             return player1_pos if dist_to_p1 <= dist_to_p2 else player2_pos
 
-    def chase_pacman(self, pacman_positions, all_ghosts=None):
-        """Each ghost uses its specific algorithm without fallbacks"""
+    def chase_pacman(self, pacman_positions, all_ghosts=None, scheduler=None, workers=None):
+        """Plan now, in the background, or through the scheduler, then move along the path"""
+        try:
+            current_pos = self.tile_position()
+            if self.id == 1:
+                # Pinky aims ahead of Pac-Man, so follow its heading even on frames without a plan
+                self.track_pacman(self.choose_target(*pacman_positions, current_pos, all_ghosts))
+            # Replan once the path is stale; otherwise keep following it
+            if self.path and self.path.drifted(pacman_positions, self.replan_distance):
+                self.path.clear()
+            if workers is not None:
+                self.plan_in_background(workers, current_pos, pacman_positions, all_ghosts)
+            elif scheduler is None:
+                self.plan(pacman_positions, all_ghosts)
+            else:
+                # Ghosts closest to a live Pac-Man plan first; the others wait in place for their turn
+                urgency = -min((abs(current_pos[0] - x) + abs(current_pos[1] - y)
+                                for x, y in pacman_positions if (x, y) != (-1, -1)), default=0)
+                if not self.path:
+                    scheduler.request(self.id, lambda: self.plan(pacman_positions, all_ghosts, scheduler.remaining()),
+                                      urgency)
+                elif self.genetic:
+                    scheduler.request((self.id, 'evolve'),
+                                      lambda: self.evolve(current_pos, self.choose_target(*pacman_positions, current_pos, all_ghosts),
+                                                          scheduler.remaining()),
+                                      urgency)
+            self.follow_path(current_pos)
+        except Exception as e:
+            print(f"Error in chase_pacman for ghost {self.id}: {str(e)}")
+            # No fallback movement - just clear the path
+            self.path.clear()
+
+    def plan_in_background(self, workers, current_pos, pacman_positions, all_ghosts):
+        """Collect a finished background plan, and start the next one before the path runs out.
+
+        Each job plans from the tile where the current path ends, so its result
+        is appended and the ghost never has to stop and wait for it.
+        """
+        result = workers.result(self.id, self.maze)
+        if result is not None:
+            end = self.path[-1] if self.path else current_pos
+            if result['epoch'] == self.plan_epoch and result['origin'] == end:
+                path = result['path']
+                self.path.extend(path.remaining())
+                self.path.target, self.path.chased = path.target, path.chased
+                # Keep the search trees and population the job built or advanced
+                for name, value in result['state'].items():
+                    setattr(self, name, value)
+        if len(self.path) <= 1 and not workers.busy(self.id):
+            origin = self.path[-1] if self.path else current_pos
+            shadow = self.shadow(origin)
+            if self.genetic:
+                # One job per tile stands in for the frames spent walking it, so the
+                # population evolves as long as it would on the main thread
+                shadow.genetic_budget_us *= max(1, round(self.tile_size / self.speed))
+            workers.submit(self.id, Ghost.plan_snapshot, self.maze, shadow,
+                           list(pacman_positions), all_ghosts)
+
+    def shadow(self, origin):
+        """Copy of this ghost standing on `origin` with no path, to plan on a worker thread"""
+        shadow = copy.copy(self)
+        shadow.path = PathFollower()  # Its own, so the worker never touches this ghost's path
+        shadow.rect = self.rect.copy()
+        shadow.rect.center = (origin[0] * self.tile_size + self.tile_size // 2,
+                              origin[1] * self.tile_size + self.tile_size // 2)
+        shadow.origin = origin
+        return shadow
+
+    @staticmethod
+    def plan_snapshot(snapshot, shadow, pacman_positions, all_ghosts):
+        """Worker side of plan_in_background: plan on the maze snapshot.
+
+        Returns the new path and the PLAN_STATE attributes; anything else the
+        shadow changes stays with it.
+        """
+        shadow.maze = snapshot
+        shadow.flow_fields = None  # Built on the live maze, which may have changed since the snapshot
+        # Search trees built on another maze object can't be reused
+        for name in ('planner', 'mcts'):
+            if getattr(getattr(shadow, name), 'maze', snapshot) is not snapshot:
+                setattr(shadow, name, None)
+        shadow.plan(pacman_positions, all_ghosts)
+        return {'epoch': shadow.plan_epoch, 'origin': shadow.origin, 'path': shadow.path,
+                'state': {name: getattr(shadow, name) for name in PLAN_STATE if hasattr(shadow, name)}}
+
+    def plan(self, pacman_positions, all_ghosts=None, time_limit=None):
+        """Each ghost uses its specific algorithm without fallbacks.
+
+        `time_limit` (seconds) caps the time-bounded planners: minimax, MCTS
+        and Inky's evolution.
+        """
         try:
             player1_pos, player2_pos = pacman_positions
             current_pos = self.tile_position()
             
             # Choose target based on ghost's strategy
             target = self.choose_target(player1_pos, player2_pos, current_pos, all_ghosts)
+            chase_target = target  # Pac-Man tile before any per-ghost offset
+            had_path = bool(self.path)
+            
+            # Team mode: take this ghost's step from the joint plan when it has one
+            if not self.path and self.team_planner is not None:
+                next_pos = self.team_planner.move_for(self.id, current_pos)
+                if next_pos is not None and next_pos != current_pos and self.is_walkable(next_pos[0], next_pos[1]):
+                    self.path.set([next_pos])
             
             # Each ghost uses its specific algorithm
-            if self.id == 1:  # Pinky - uses BFS
+            if self.use_optimal:  # Any ghost listed in OPTIMAL_GHOSTS - uses the solved pursuit table
+                if not self.path:
+                    table = pursuit_table(self.maze, POLICY_DIR, self.distance_table)
+                    next_pos = table.next_step(current_pos, target)
+                    if next_pos is not None and self.is_walkable(next_pos[0], next_pos[1]):
+                        self.path.set([next_pos])
+                    else:
+                        self.path.set([self.smart_random_move(current_pos, target)])
+
+            elif self.use_mcts:  # Any ghost listed in MCTS_GHOSTS - uses MCTS
+                if not self.path:
+                    if self.mcts is None:
+                        self.mcts = MCTSPlanner(self.maze)
+                    self.mcts.time_limit = self.capped(self.mcts_budget, time_limit)
+                    next_pos = self.mcts.choose_move(current_pos, target)
+                    if next_pos != current_pos and self.is_walkable(next_pos[0], next_pos[1]):
+                        self.path.set([next_pos])
+                    else:
+                        print(f"Ghost {self.id} MCTS found no move, falling back to smart random move")
+                        self.path.set([self.smart_random_move(current_pos, target)])
+
+            elif self.id == 1:  # Pinky - uses BFS
                 target = self.get_pinky_target(target)
                 if not self.path:
                     # Try BFS up to 3 times before falling back
                     for attempt in range(3):
-                        self.path = bfs(current_pos, target, self.maze)
+                        self.path.set(self.find_path(current_pos, target,
+                                                     lambda s, g: bfs(s, g, self.maze)))
                         if self.path:
                             break
                         print(f"Pinky (Ghost {self.id}) BFS attempt {attempt + 1} failed, retrying...")
                     if not self.path:
                         print(f"Pinky (Ghost {self.id}) falling back to smart random move - All BFS attempts failed")
-                        self.path = [self.smart_random_move(current_pos, target)]
+                        self.path.set([self.smart_random_move(current_pos, target)])
                 
             elif self.id == 2:  # Blinky - uses A*
+                if not self.path and self.flow_fields is not None and not self.incremental:
+                    # Blinky chases a Pac-Man tile directly, so read the shared field first
+                    next_pos = self.flow_fields.next_move(current_pos, target)
+                    if next_pos is not None:
+                        self.path.set([next_pos])
                 if not self.path:
                     # Try A* up to 3 times before falling back
                     for attempt in range(3):
-                        self.path = astar(current_pos, target, self.maze)
+                        self.path.set(self.find_path(current_pos, target,
+                                                     lambda s, g: astar(s, g, self.maze, self.search_stats)))
                         if self.path:
                             break
                         print(f"Blinky (Ghost {self.id}) A* attempt {attempt + 1} failed, retrying...")
                     if not self.path:
                         print(f"Blinky (Ghost {self.id}) falling back to smart random move - All A* attempts failed")
-                        self.path = [self.smart_random_move(current_pos, target)]
+                        self.path.set([self.smart_random_move(current_pos, target)])
                 
             elif self.id == 3:  # Clyde - uses Minimax
                 if not self.path:
@@ -249,120 +475,158 @@ class Ghost:
                         for attempt in range(3):
                             possible_moves = minimax_get_possible_moves(current_pos, self.maze)
                             if possible_moves:
-                                best_move = minimax_choose_move(current_pos, target, self.maze, depth=4)
+                                best_move = minimax_choose_move(current_pos, target, self.maze,
+                                                                time_limit=self.capped(self.minimax_budget, time_limit),
+                                                                stats=self.search_stats)
                                 
                                 if best_move == current_pos:
                                     print(f"Clyde (Ghost {self.id}) Minimax attempt {attempt + 1} returned current position, retrying...")
                                     continue
                                     
                                 if best_move and best_move != current_pos and self.is_walkable(best_move[0], best_move[1]):
-                                    self.path = [best_move]
+                                    self.path.set([best_move])
                                     break
                                 else:
                                     print(f"Clyde (Ghost {self.id}) Minimax attempt {attempt + 1} invalid move, retrying...")
                                     # Try alternative moves
                                     for move in possible_moves:
                                         if move != current_pos and self.is_walkable(move[0], move[1]):
-                                            self.path = [move]
+                                            self.path.set([move])
                                             break
                                     if self.path:
                                         break
                     except Exception as e:
                         print(f"Clyde (Ghost {self.id}) falling back to smart random move - Minimax error: {str(e)}")
-                        self.path = [self.smart_random_move(current_pos, target)]
+                        self.path.set([self.smart_random_move(current_pos, target)])
                         
             elif self.id == 4:  # Inky - uses Genetic Algorithm
-                if not self.path:
-                    try:
-                        # Create genetic AI instance if not exists
-                        if not hasattr(self, 'genetic_ai'):
-                            self.genetic_ai = GeneticGhostAI()
+                try:
+                    self.evolve(current_pos, target, time_limit)
+                    
+                    if not self.path:
+                        # Play the first move of the best plan, then shift every plan by one step
+                        direction = DIRECTIONS[self.genetic_ai.best[0]]
+                        self.genetic_ai.shift()
+                        dx, dy = 0, 0
+                        if direction == 'up':
+                            dy = -1
+                        elif direction == 'down':
+                            dy = 1
+                        elif direction == 'left':
+                            dx = -1
+                        elif direction == 'right':
+                            dx = 1
                         
-                        # Try Genetic Algorithm up to 3 times before falling back
-                        for attempt in range(3):
-                            def evaluate_path(genes):
-                                return calculate_fitness(genes, current_pos, target, self.maze)
-                            
-                            self.genetic_ai.evaluate(evaluate_path)
-                            self.genetic_ai.evolve()
-                            
-                            if self.genetic_ai.best and hasattr(self.genetic_ai.best, 'genes'):
-                                direction = self.genetic_ai.best.genes[0]
-                                dx, dy = 0, 0
-                                if direction == 'up':
-                                    dy = -1
-                                elif direction == 'down':
-                                    dy = 1
-                                elif direction == 'left':
-                                    dx = -1
-                                elif direction == 'right':
-                                    dx = 1
-                                
-                                next_pos = (current_pos[0] + dx, current_pos[1] + dy)
-                                if self.is_walkable(next_pos[0], next_pos[1]):
-                                    self.path = [next_pos]
-                                    break
-                                else:
-                                    print(f"Inky (Ghost {self.id}) Genetic attempt {attempt + 1} invalid move, retrying...")
-                            else:
-                                print(f"Inky (Ghost {self.id}) Genetic attempt {attempt + 1} no valid solution, retrying...")
+                        next_pos = (current_pos[0] + dx, current_pos[1] + dy)
+                        if self.is_walkable(next_pos[0], next_pos[1]):
+                            self.path.set([next_pos])
                         else:
-                            print(f"Inky (Ghost {self.id}) falling back to smart random move - All Genetic attempts failed")
-                            self.path = [self.smart_random_move(current_pos, target)]
-                    except Exception as e:
-                        print(f"Inky (Ghost {self.id}) falling back to smart random move - Genetic algorithm error: {str(e)}")
-                        self.path = [self.smart_random_move(current_pos, target)]
-            
-            # Move along path for all ghosts
-            if self.path:
-                next_pos = self.path[0]
-                target_x = next_pos[0] * self.tile_size + self.tile_size // 2
-                target_y = next_pos[1] * self.tile_size + self.tile_size // 2
-                
-                dx = target_x - self.rect.centerx
-                dy = target_y - self.rect.centery
-                
-                # Check if next position would be walkable before moving
-                next_x = self.rect.centerx + self.speed * (1 if dx > 0 else -1)
-                next_y = self.rect.centery + self.speed * (1 if dy > 0 else -1)
-                next_tile = (round(next_x / self.tile_size), round(next_y / self.tile_size))
-                
-                if self.is_walkable(next_tile[0], next_tile[1]):
-                    if abs(dx) > abs(dy):
-                        self.rect.centerx += self.speed * (1 if dx > 0 else -1)
-                        self.direction_name = 'right' if dx > 0 else 'left'
-                    else:
-                        self.rect.centery += self.speed * (1 if dy > 0 else -1)
-                        self.direction_name = 'down' if dy > 0 else 'up'
-                
-                # Check if reached next position
-                if (abs(self.rect.centerx - target_x) < self.speed and 
-                    abs(self.rect.centery - target_y) < self.speed):
-                    self.rect.center = (target_x, target_y)
-                    self.path.pop(0)
-                
-                # Verify we haven't moved into a wall
-                new_pos = self.tile_position()
-                if not self.is_walkable(new_pos[0], new_pos[1]):
-                    # Revert to last valid position
-                    self.rect.centerx = current_pos[0] * self.tile_size + self.tile_size // 2
-                    self.rect.centery = current_pos[1] * self.tile_size + self.tile_size // 2
-                    self.path = []  # Clear path to force recalculation
+                            print(f"Inky (Ghost {self.id}) genetic move blocked, falling back to smart random move")
+                            self.path.set([self.smart_random_move(current_pos, target)])
+                except Exception as e:
+                    print(f"Inky (Ghost {self.id}) falling back to smart random move - Genetic algorithm error: {str(e)}")
+                    self.path.set([self.smart_random_move(current_pos, target)])
 
+            # Remember which Pac-Man a new path chases, for the drift check
+            if self.path and not had_path:
+                self.path.target = chase_target
+                self.path.chased = pacman_positions.index(chase_target) if chase_target in pacman_positions else None
+                self.search_stats['plans'] = self.search_stats.get('plans', 0) + 1
         except Exception as e:
-            print(f"Error in chase_pacman for ghost {self.id}: {str(e)}")
-            # No fallback movement - just clear the path
-            self.path = []
+            print(f"Error in planning for ghost {self.id}: {str(e)}")
+            self.path.clear()
+
+    def evolve(self, current_pos, target, time_limit=None):
+        """Advance Inky's population toward target within its per-frame budget.
+
+        Plans are scored from the tile the current path ends on, where the
+        next move will be played from.
+        """
+        try:
+            origin = self.path[-1] if self.path else current_pos
+            def evaluate_paths(genomes):
+                return batch_fitness(genomes, origin, target, self.maze)
+            
+            # Create genetic AI instance if not exists, with one full generation scored
+            if not hasattr(self, 'genetic_ai'):
+                self.genetic_ai = GeneticGhostAI()
+                if self.policy is not None:
+                    seeded = self.policy.codes[:self.genetic_ai.genomes.shape[1]]
+                    self.genetic_ai.genomes[0, :len(seeded)] = seeded
+                self.genetic_ai.evaluate(evaluate_paths)
+                self.genetic_ai.evolve()
+            
+            # Keep evolving a few individuals every frame, within the budget
+            self.genetic_ai.advance(evaluate_paths,
+                                    self.capped(self.genetic_budget_us / 1e6, time_limit) * 1e6)
+        except Exception as e:
+            print(f"Inky (Ghost {self.id}) genetic evolution error: {str(e)}")
+
+    @staticmethod
+    def capped(budget, time_limit):
+        """A planner's own budget, cut to time_limit if one is set (never below 1 ms, or the budget if smaller)"""
+        return budget if time_limit is None else min(budget, max(0.001, time_limit))
+
+    def follow_path(self, current_pos):
+        """Move toward the next tile of the current path"""
+        if self.path:
+            next_pos = self.path[0]
+            target_x = next_pos[0] * self.tile_size + self.tile_size // 2
+            target_y = next_pos[1] * self.tile_size + self.tile_size // 2
+            
+            dx = target_x - self.rect.centerx
+            dy = target_y - self.rect.centery
+            
+            # Check if next position would be walkable before moving
+            next_x = self.rect.centerx + self.speed * (1 if dx > 0 else -1)
+            next_y = self.rect.centery + self.speed * (1 if dy > 0 else -1)
+            next_tile = (round(next_x / self.tile_size), round(next_y / self.tile_size))
+            
+            if self.is_walkable(next_tile[0], next_tile[1]):
+                if abs(dx) > abs(dy):
+                    self.rect.centerx += self.speed * (1 if dx > 0 else -1)
+                    self.direction_name = 'right' if dx > 0 else 'left'
+                else:
+                    self.rect.centery += self.speed * (1 if dy > 0 else -1)
+                    self.direction_name = 'down' if dy > 0 else 'up'
+            
+            # Check if reached next position
+            if (abs(self.rect.centerx - target_x) < self.speed and 
+                abs(self.rect.centery - target_y) < self.speed):
+                self.rect.center = (target_x, target_y)
+                self.path.advance()
+            
+            # Verify we haven't moved into a wall
+            new_pos = self.tile_position()
+            if not self.is_walkable(new_pos[0], new_pos[1]):
+                # Revert to last valid position
+                self.rect.centerx = current_pos[0] * self.tile_size + self.tile_size // 2
+                self.rect.centery = current_pos[1] * self.tile_size + self.tile_size // 2
+                self.path.clear()  # Clear path to force recalculation
+
+    def find_path(self, start, goal, search):
+        """Plan with the incremental planner if enabled, else run a fresh search"""
+        if start == goal:
+            return [start]  # Already there: hold this tile for a step
+        if not self.incremental:
+            return search(start, goal)
+        if self.planner is None:
+            self.planner = IncrementalAStar(self.maze)
+        return self.planner.plan(start, goal)  # Repairs itself if the maze version moved on
+
+    def track_pacman(self, pacman_pos):
+        """Remember the last one-tile step of the Pac-Man Pinky targets; called every frame"""
+        last = getattr(self, 'last_pacman_pos', None)
+        if last is not None and pacman_pos != last:
+            dx, dy = pacman_pos[0] - last[0], pacman_pos[1] - last[1]
+            # A jump (respawn, or a switch to the other Pac-Man) says nothing about heading
+            self.pacman_heading = (dx, dy) if abs(dx) + abs(dy) == 1 else (0, 0)
+        self.last_pacman_pos = pacman_pos
 
     def get_pinky_target(self, pacman_pos):
         """Calculate Pinky's target 4 tiles ahead of Pac-Man"""
-        # Get the direction Pacman is moving based on the last two positions
-        if not hasattr(self, 'last_pacman_pos'):
-            self.last_pacman_pos = pacman_pos
-            return pacman_pos
-        
-        dx = pacman_pos[0] - self.last_pacman_pos[0]
-        dy = pacman_pos[1] - self.last_pacman_pos[1]
+        # Direction of the Pac-Man's last step, tracked every frame by track_pacman()
+        dx, dy = getattr(self, 'pacman_heading', (0, 0))
         
         # If Pacman is not moving, use current position
         if dx == 0 and dy == 0:
@@ -385,8 +649,8 @@ class Ghost:
                 elif self.is_walkable(target[0] - 1, target[1]):
                     target = (target[0] - 1, target[1])
         
-        self.last_pacman_pos = pacman_pos
-        return target
+        # Still a wall or off the grid: chase Pac-Man itself
+        return target if self.is_walkable(target[0], target[1]) else pacman_pos
 
     def smart_random_move(self, pos, pacman_pos):
         """Move randomly but biased toward Pac-Man"""
@@ -394,13 +658,13 @@ class Ghost:
         valid_moves = []
         
         # Calculate distance to Pac-Man
-        current_dist = abs(pos[0]-pacman_pos[0]) + abs(pos[1]-pacman_pos[1])
+        current_dist = self.maze_distance(pos, pacman_pos)
         
         for dx, dy in directions:
             nx, ny = pos[0]+dx, pos[1]+dy
             if self.is_walkable(nx, ny):
                 # Calculate new distance to Pac-Man
-                new_dist = abs(nx-pacman_pos[0]) + abs(ny-pacman_pos[1])
+                new_dist = self.maze_distance((nx, ny), pacman_pos)
                 
                 # Weight moves that get closer to Pac-Man more heavily
                 if new_dist < current_dist:
@@ -417,7 +681,10 @@ class Ghost:
         self.rect.x = self.x * self.tile_size
         self.rect.y = self.y * self.tile_size
         self.has_escaped = False
-        self.path = []
+        self.path.clear()
+        self.planner = None
+        self.mcts = None
+        self.plan_epoch += 1
         self.direction_name = 'down'
         self.current_frame = 0
         self.frame_counter = 0
@@ -1,16 +1,18 @@
 import pygame
-import random
 import math
 from scoreboard import Scoreboard
 from player import Player
-from ghosts2 import Ghost  # Updated import to match the new ghosts.py file
+from ghosts2 import Ghost, OPTIMAL_GHOSTS, POLICY_DIR  # Updated import to match the new ghosts.py file
 from gate import Gate
-from collections import deque
 from pygame import mixer
 from frontpage import front_page
 from gameover import game_over_screen
 import sys
 from sprite import load_sprite_sheet
+from search_agents import DistanceTable, FlowFields, TeamPlanner, eval_features
+from maze import Maze, build_maze, mark_cage_walls, nearest_open_tiles
+from pursuit import pursuit_table
+from scheduler import AIScheduler, AsyncPlanner
 import json
 import os
 
@@ -50,7 +52,7 @@ maze_surface = pygame.Surface((WIDTH, HEIGHT))
 scoreboard_surface = pygame.Surface((WIDTH, SCOREBOARD_HEIGHT))
 
 # Load sprites
-pacman_right, pacman2_right, ghost_frames = load_sprite_sheet()
+pacman_right, pacman2_right, ghost_frames = load_sprite_sheet(TILE)  # Scaled to one tile, once
 
 # Initialize scoreboard with the scoreboard surface
 scoreboard = Scoreboard(scoreboard_surface)
@@ -85,13 +87,6 @@ def handle_teleporters(entity):
         elif entity.x == x2 and entity.y == y2:
             entity.x, entity.y = x1, y1
 
-def reserve_ghost_box():
-    # Calculating the center of the maze to place the ghost cage
-    mid_r, mid_c = ROWS // 2, COLS // 2
-    for r in range(mid_r - 1, mid_r + 2):
-        for c in range(mid_c - 2, mid_c + 3):
-            maze[r][c] = 0  # Make it a path (not wall)
-
 def draw_ghost_cage():
     # Coordinates
     mid_r, mid_c = ROWS // 2, COLS // 2
@@ -102,13 +97,8 @@ def draw_ghost_cage():
 
     GATE_TILES = (CAGE_MID_ROW + 2, CAGE_MID_COL)
 
-    # Mark cage walls as impassable (maze[y][x] = 2 for walls)
-    for r in range(mid_r - 1, mid_r + 3):  # Top and Bottom walls
-        maze[r][mid_c - 2] = 2  # Left wall
-        maze[r][mid_c + 3] = 2  # Right wall
-    for c in range(mid_c - 2, mid_c + 4):  # Left and Right walls
-        maze[mid_r - 1][c] = 2  # Top wall
-        maze[mid_r + 2][c] = 2  # Bottom wall
+    # Mark cage walls as impassable for players (value 2)
+    mark_cage_walls(maze)
 
     # Cage boundaries (visual representation)
     pygame.draw.line(maze_surface, CAGE_COLOR, (left, top), (right, top), 2)    # Top
@@ -118,83 +108,34 @@ def draw_ghost_cage():
 
     # Draw gate only if not broken and tile is a path
     gate_tile_r, gate_tile_c = GATE_TILES
-    if maze[gate_tile_r][gate_tile_c] == 0:  # Gate is walkable
+    if maze.get(gate_tile_c, gate_tile_r) == 0:  # Gate is walkable
         gate_x = gate_tile_c * TILE
         gate_y = gate_tile_r * TILE
         flicker_color = GATE_COLOR
         pygame.draw.line(maze_surface, flicker_color, (gate_x, gate_y), (gate_x + TILE, gate_y), 2)
 
-def remove_dead_ends(iterations=30):
-    for _ in range(iterations):
-        for r in range(1, ROWS-1):
-            for c in range(1, COLS-1):
-                if maze[r][c] == 0:
-                    neighbors = [(r+1, c), (r-1, c), (r, c+1), (r, c-1)]
-                    walls = [maze[nr][nc] for nr, nc in neighbors]
-                    if walls.count(1) == 3:  # It's a dead end
-                        random.shuffle(neighbors)
-                        for nr, nc in neighbors:
-                            if maze[nr][nc] == 1:
-                                maze[nr][nc] = 0
-                                break
-
-def generate_maze(r, c):
-    maze[r][c] = 0
-    dirs = [(0, 2), (0, -2), (2, 0), (-2, 0)]
-    random.shuffle(dirs)
-
-    for dr, dc in dirs:
-        nr, nc = r + dr, c + dc
-        if 0 <= nr < ROWS and 0 <= nc < COLS and maze[nr][nc] == 1:
-            maze[r + dr // 2][c + dc // 2] = 0
-            generate_maze(nr, nc)
-
 def regenerate_maze():
     mid_r, mid_c = ROWS // 2, COLS // 2
-    global maze, pellets
-    maze = [[1 for _ in range(COLS)] for _ in range(ROWS)]
-    
-    # Generate maze first
-    generate_maze(1, 1)
-    
-    # Then reserve ghost box
-    reserve_ghost_box()
-    
-    # Remove dead ends
-    remove_dead_ends(50)
+    global pellets, distance_table
+    # Same Maze object, so players, ghosts and the gate see the new layout
+    build_maze(maze)
     
     # Draw ghost cage last
     draw_ghost_cage()
+
+    # Precompute shortest distances and Clyde's evaluation planes once for the new layout
+    distance_table = DistanceTable(maze)
+    eval_features(maze, distance_table)
+    if OPTIMAL_GHOSTS:
+        pursuit_table(maze, POLICY_DIR, distance_table)
     
     # Initialize pellets
-    pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze[r][c] == 0)
+    pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze.get(c, r) == 0)
     pellets -= consumed_pellets
     for r, c in CAGE_TILES:
         pellets.discard((r, c))
     pellets.discard(GATE_TILE)
 
-def find_nearest_valid_position(maze, start_x, start_y):
-    """Find the nearest valid position in the maze."""
-    queue = deque([(start_x, start_y)])
-    visited = set([(start_x, start_y)])
-
-    while queue:
-        x, y = queue.popleft()
-
-        # Check if the current tile is walkable
-        if maze[y][x] == 0:
-            return (x, y)
-
-        # Explore neighboring tiles
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < len(maze[0]) and 0 <= ny < len(maze) and (nx, ny) and maze[nx][ny] == 0 not in visited:
-                visited.add((nx, ny))
-                queue.append((nx, ny))
-
-    # Fallback: If no valid position is found, return the start position
-    return (start_x, start_y)
-
 def draw_pellets():
     for r, c in pellets:
         pygame.draw.circle(maze_surface, (255, 255, 255), (c * TILE + TILE // 2, r * TILE + TILE // 2), 3)
@@ -249,25 +190,45 @@ except Exception as e:
     beginning_sound = None
 
 # Initialize all walls
-maze = [[1 for _ in range(COLS)] for _ in range(ROWS)]
+maze = Maze(ROWS, COLS)
 
 # Show front page first
 if not front_page(high_score):
     pygame.quit()
     sys.exit()
 
-# Start maze generation from (1, 1)
-generate_maze(1, 1)
-reserve_ghost_box()
-remove_dead_ends(50)  # You can tweak the number for more/less loops
+# Generate the maze (passages from (1, 1), ghost box, loops, cage walls)
+build_maze(maze, dead_end_passes=50)  # You can tweak the number for more/less loops
 draw_ghost_cage()
 
 gate = Gate(maze_surface, maze, TILE)
+# The gate sits on the cage's bottom wall, which stays CAGE_WALL: ghosts pass, players don't.
+# draw_ghost_cage() re-marks it every frame, so the layout (and every cache keyed by it) is final here
 GATE_TILE = (CAGE_MID_ROW + 2, CAGE_MID_COL)
-maze[GATE_TILE[0]][GATE_TILE[1]] = 0  # Make sure it's path
+
+# All-pairs distances for the ghost AI, rebuilt whenever the maze regenerates
+distance_table = DistanceTable(maze)
+eval_features(maze, distance_table)
+if OPTIMAL_GHOSTS:
+    pursuit_table(maze, POLICY_DIR, distance_table)  # Solve the pursuit game once per layout
+
+# Distance fields toward each live Pac-Man, shared by all ghosts
+flow_fields = FlowFields(maze)
+
+# Joint search over all free ghosts; set TEAM_SEARCH = True to replace the per-ghost algorithms
+TEAM_SEARCH = False
+team_planner = TeamPlanner() if TEAM_SEARCH else None
+
+# AI time allowed per frame; ghost replans that don't fit wait for a later frame
+AI_BUDGET_MS = 4.0
+scheduler = AIScheduler(AI_BUDGET_MS)
+
+# Plan on a background thread instead; ghosts keep moving while a plan is computed
+ASYNC_PLANNING = False
+workers = AsyncPlanner() if ASYNC_PLANNING else None
 
 # Initialize pellets
-pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze[r][c] == 0)
+pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze.get(c, r) == 0)
 # Exclude ghost cage and gate tiles
 for r, c in CAGE_TILES:
     pellets.discard((r, c))
@@ -299,14 +260,14 @@ cage_barrier_broken = {
 
 # Initialize ghosts with updated Ghost class
 ghosts = [
-    Ghost(2, COLS // 2 , ROWS // 2, ghost_frames['blinky'], TILE, maze, gate),  # Updated to use the new Ghost class
-    Ghost(4, COLS // 2-1, ROWS // 2, ghost_frames['inky'], TILE, maze, gate),
-    Ghost(1, COLS // 2+1, ROWS // 2, ghost_frames['pinky'], TILE, maze, gate),
-    Ghost(3, int(COLS // 2-1.7), int(ROWS // 2-0.75) , ghost_frames['clyde'], TILE, maze, gate)
+    Ghost(2, COLS // 2 , ROWS // 2, ghost_frames['blinky'], TILE, maze, gate, distance_table, flow_fields, team_planner),  # Updated to use the new Ghost class
+    Ghost(4, COLS // 2-1, ROWS // 2, ghost_frames['inky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+    Ghost(1, COLS // 2+1, ROWS // 2, ghost_frames['pinky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+    Ghost(3, int(COLS // 2-1.7), int(ROWS // 2-0.75) , ghost_frames['clyde'], TILE, maze, gate, distance_table, flow_fields, team_planner)
 ]
 
-center_x = len(maze[0]) // 2
-center_y = len(maze) // 2 + 1  # One row below cage center
+center_x = maze.cols // 2
+center_y = maze.rows // 2 + 1  # One row below cage center
 
 # Define gate rectangle (adjust width/height if needed)
 gate_rect = pygame.Rect(center_x * TILE, center_y * TILE, TILE, TILE)
@@ -317,7 +278,7 @@ def draw(surface):
     # Draw maze walls and paths
     for y in range(ROWS):
         for x in range(COLS):
-            color = (0, 0, 255) if maze[y][x] == 1 else (0, 0, 0)
+            color = (0, 0, 255) if maze.get(x, y) == 1 else (0, 0, 0)
             pygame.draw.rect(surface, color, (x*TILE, y*TILE, TILE, TILE))
     
     draw_pellets()
@@ -329,6 +290,7 @@ def draw(surface):
 
 run = True
 clock = pygame.time.Clock()
+regen_window = pygame.time.get_ticks() // 30000
 
 while run:
     clock.tick(60)  # Increased from 30 to 60 FPS for smoother gameplay
@@ -338,11 +300,6 @@ while run:
     if not pygame.key.get_focused():
         continue
     
-    # Store player and ghost positions
-    stored_player1_pos = (player1.x, player1.y)
-    stored_player2_pos = (player2.x, player2.y)
-    stored_ghost_positions = [(ghost.x, ghost.y) for ghost in ghosts]
-    
     # CHECKING COLLISIONS
     player1.check_ghost_collision(ghosts)
     player2.check_ghost_collision(ghosts)
@@ -373,14 +330,17 @@ while run:
             
             # Reset ghosts
             ghosts = [
-                Ghost(2, COLS // 2, ROWS // 2, ghost_frames['blinky'], TILE, maze, gate),
-                Ghost(4, COLS // 2-1, ROWS // 2, ghost_frames['inky'], TILE, maze, gate),
-                Ghost(1, COLS // 2+1, ROWS // 2, ghost_frames['pinky'], TILE, maze, gate),
-                Ghost(3, int(COLS // 2-1.7), int(ROWS // 2-0.75), ghost_frames['clyde'], TILE, maze, gate)
+                Ghost(2, COLS // 2, ROWS // 2, ghost_frames['blinky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+                Ghost(4, COLS // 2-1, ROWS // 2, ghost_frames['inky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+                Ghost(1, COLS // 2+1, ROWS // 2, ghost_frames['pinky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+                Ghost(3, int(COLS // 2-1.7), int(ROWS // 2-0.75), ghost_frames['clyde'], TILE, maze, gate, distance_table, flow_fields, team_planner)
             ]
+            scheduler.clear()  # Drop replans queued by the old ghosts
+            if workers is not None:
+                workers.clear()
             
             # Reset pellets
-            pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze[r][c] == 0)
+            pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze.get(c, r) == 0)
             for r, c in CAGE_TILES:
                 pellets.discard((r, c))
             pellets.discard(GATE_TILE)
@@ -405,7 +365,7 @@ while run:
             winner = "Tie"
         if game_over_screen(winner, player1.score, player2.score):
             # Reset pellets
-            pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze[r][c] == 0)
+            pellets = set((r, c) for r in range(ROWS) for c in range(COLS) if maze.get(c, r) == 0)
             for r, c in CAGE_TILES:
                 pellets.discard((r, c))
             pellets.discard(GATE_TILE)
@@ -426,16 +386,20 @@ while run:
             
             # Reset ghosts
             ghosts = [
-                Ghost(2, COLS // 2, ROWS // 2, ghost_frames['blinky'], TILE, maze, gate),
-                Ghost(4, COLS // 2-1, ROWS // 2, ghost_frames['inky'], TILE, maze, gate),
-                Ghost(1, COLS // 2+1, ROWS // 2, ghost_frames['pinky'], TILE, maze, gate),
-                Ghost(3, int(COLS // 2-1.7), int(ROWS // 2-0.75), ghost_frames['clyde'], TILE, maze, gate)
+                Ghost(2, COLS // 2, ROWS // 2, ghost_frames['blinky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+                Ghost(4, COLS // 2-1, ROWS // 2, ghost_frames['inky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+                Ghost(1, COLS // 2+1, ROWS // 2, ghost_frames['pinky'], TILE, maze, gate, distance_table, flow_fields, team_planner),
+                Ghost(3, int(COLS // 2-1.7), int(ROWS // 2-0.75), ghost_frames['clyde'], TILE, maze, gate, distance_table, flow_fields, team_planner)
             ]
+            scheduler.clear()  # Drop replans queued by the old ghosts
+            if workers is not None:
+                workers.clear()
             # Reset scoreboard
             scoreboard = Scoreboard(scoreboard_surface)
             continue
     
-    if pygame.time.get_ticks() % 30000 < 1000:  # Regenerate every 30 seconds
+    if pygame.time.get_ticks() // 30000 > regen_window:  # Regenerate every 30 seconds
+        regen_window = pygame.time.get_ticks() // 30000
         # Store current scores and lives
         player1_score = player1.score
         player2_score = player2.score
@@ -447,8 +411,17 @@ while run:
         player1.update_maze(maze)
         player2.update_maze(maze)   
 
-        for ghost in ghosts:
-            ghost.update_maze(maze)
+        # One sweep over the new layout finds the nearest open tile for everyone it walled in.
+        # No entity is moved onto another's tile: ghosts avoid players that stay put, and
+        # players then avoid every ghost tile
+        player_positions = [(player1.x, player1.y), (player2.x, player2.y)]
+        player_open = nearest_open_tiles(maze, players=True)
+        staying = [pos for pos in player_positions if player_open.nearest_to(pos) == pos]
+        ghost_tiles = nearest_open_tiles(maze).assign([ghost.tile_position() for ghost in ghosts], unique=True,
+                                                      taken=staying)
+        player_tiles = player_open.assign(player_positions, unique=True, taken=ghost_tiles)
+        for ghost, tile in zip(ghosts, ghost_tiles):
+            ghost.update_maze(maze, distance_table, tile)
 
         # Restore scores and lives
         player1.score = player1_score
@@ -456,13 +429,12 @@ while run:
         player1.lives = player1_lives
         player2.lives = player2_lives
         
-        # Reposition players
-        player1.x, player1.y = find_nearest_valid_position(maze, *stored_player1_pos)
-        player2.x, player2.y = find_nearest_valid_position(maze, *stored_player2_pos)
-        
-        # Reposition ghosts
-        for i, ghost in enumerate(ghosts):
-            ghost.x, ghost.y = find_nearest_valid_position(maze, *stored_ghost_positions[i])
+        # Reposition players, never both onto one tile
+        for player, tile in zip((player1, player2), player_tiles):
+            if tile is not None and tile != (player.x, player.y):
+                player.x, player.y = tile
+                player.target_x = player.current_x = tile[0] * TILE
+                player.target_y = player.current_y = tile[1] * TILE
     
     # Handle teleporters
     handle_teleporters(player1)
@@ -481,9 +453,16 @@ while run:
     player2.eat_pellet(consumed_pellets)
     
     # Update ghosts
+    flow_fields.update([(p.x, p.y) for p in (player1, player2) if p.alive])
+    if team_planner is not None:
+        team_ghosts = {g.id: g.tile_position() for g in ghosts if g.alive and g.has_escaped}
+        team_targets = [(p.x, p.y) for p in (player1, player2) if p.alive]
+        scheduler.request('team', lambda: team_planner.update(team_ghosts, team_targets, maze, scheduler.remaining()),
+                          urgency=1)
     for ghost in ghosts:
         pacman_positions = [(player1.x, player1.y), (player2.x, player2.y)]
-        ghost.update(ghosts, pacman_positions)
+        ghost.update(ghosts, pacman_positions, scheduler, workers)
+    scheduler.run()  # Queued replans, most urgent first, within AI_BUDGET_MS
     
     gate.update_gate_visuals()
     
@@ -508,4 +487,6 @@ while run:
         if event.type == pygame.QUIT:
             run = False
 
+if workers is not None:
+    workers.shutdown()
 pygame.quit()
\ No newline at end of file
@@ -0,0 +1,337 @@
+import random
+from collections import deque
+import numpy as np
+
+# Cell values
+PATH = 0
+WALL = 1
+CAGE_WALL = 2  # Blocks players, ghosts can pass
+
+# Neighbor order used by every search: down, right, up, left
+NEIGHBOR_OFFSETS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+# Zobrist keys per grid size, shared by every maze of that size
+_zobrist_tables = {}
+
+def _zobrist_table(size):
+    if size not in _zobrist_tables:
+        rng = random.Random(size)  # Fixed seed so hashes are stable between runs
+        _zobrist_tables[size] = [[rng.getrandbits(64) for _ in range(3)] for _ in range(size)]
+    return _zobrist_tables[size]
+
+
+class Maze:
+    """Maze grid stored as a flat bytearray indexed by cell id (y * cols + x).
+
+    All writes go through set(), fill() or load(). Each real change bumps
+    `version` and updates the Zobrist `layout_hash` in O(1), so caches can
+    tell whether the maze changed without comparing grids. `passable` and
+    `neighbors` hold the ghost walkability rule (anything but WALL) and the
+    walkable neighbor ids of each cell, in NEIGHBOR_OFFSETS order.
+    """
+    def __init__(self, rows, cols, fill=WALL):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.cells = bytearray([fill]) * self.size
+        self.version = 0
+        self._zobrist = _zobrist_table(self.size)
+        self._rebuild()
+
+    @classmethod
+    def from_grid(cls, grid):
+        """Build a Maze from a list of rows, as used by the old list-of-lists mazes"""
+        maze = cls(len(grid), len(grid[0]))
+        maze.load(grid)
+        return maze
+
+    @classmethod
+    def from_buffer(cls, rows, cols, buffer):
+        """Read-only Maze over an existing buffer, e.g. shared memory, without copying it"""
+        maze = cls.__new__(cls)
+        maze.rows = rows
+        maze.cols = cols
+        maze.size = rows * cols
+        maze.cells = memoryview(buffer)[:maze.size].toreadonly()
+        maze.version = 0
+        maze._zobrist = _zobrist_table(maze.size)
+        maze._rebuild()
+        return maze
+
+    def _rebuild(self):
+        cells, zobrist = self.cells, self._zobrist
+        self.passable = bytearray(cell != WALL for cell in cells)
+        self.layout_hash = 0
+        for cell, value in enumerate(cells):
+            self.layout_hash ^= zobrist[cell][value]
+        self.neighbors = [self._open_neighbor_ids(cell) for cell in range(self.size)]
+        self._open_tiles = None
+        self._open_tiles_version = -1
+
+    def _open_neighbor_ids(self, cell):
+        cols, passable = self.cols, self.passable
+        x = cell % cols
+        ids = []
+        if cell + cols < self.size and passable[cell + cols]:
+            ids.append(cell + cols)
+        if x + 1 < cols and passable[cell + 1]:
+            ids.append(cell + 1)
+        if cell >= cols and passable[cell - cols]:
+            ids.append(cell - cols)
+        if x > 0 and passable[cell - 1]:
+            ids.append(cell - 1)
+        return tuple(ids)
+
+    def load(self, grid):
+        """Replace the whole layout from a list of rows"""
+        self.cells[:] = bytes(value for row in grid for value in row)
+        self.version += 1
+        self._rebuild()
+
+    def fill(self, value):
+        """Set every cell to one value"""
+        self.cells[:] = bytes([value]) * self.size
+        self.version += 1
+        self._rebuild()
+
+    def copy(self):
+        """Independent copy with the same layout and version"""
+        clone = Maze(self.rows, self.cols)
+        clone.cells[:] = self.cells
+        clone.version = self.version
+        clone._rebuild()
+        return clone
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def cell_id(self, x, y):
+        return y * self.cols + x
+
+    def open_tiles(self):
+        """(x, y) of every ghost-walkable cell, rebuilt at most once per version.
+
+        Shared by every caller, so treat it as read-only; random.choice on it is O(1).
+        """
+        if self._open_tiles_version != self.version:
+            passable = self.passable
+            self._open_tiles = [self.position(cell) for cell in range(self.size) if passable[cell]]
+            self._open_tiles_version = self.version
+        return self._open_tiles
+
+    def position(self, cell_id):
+        """(x, y) tile of a flattened id"""
+        return (cell_id % self.cols, cell_id // self.cols)
+
+    def get(self, x, y):
+        """Cell value, with everything outside the grid reading as WALL"""
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return self.cells[y * self.cols + x]
+        return WALL
+
+    def set(self, x, y, value):
+        """Write one cell; writing the value it already holds is free"""
+        cell = y * self.cols + x
+        old = self.cells[cell]
+        if old == value:
+            return
+        self.cells[cell] = value
+        self.layout_hash ^= self._zobrist[cell][old] ^ self._zobrist[cell][value]
+        self.version += 1
+        passable = value != WALL
+        if passable != bool(self.passable[cell]):
+            self.passable[cell] = passable
+            for n in self._all_neighbor_ids(cell):
+                self.neighbors[n] = self._open_neighbor_ids(n)
+
+    def _all_neighbor_ids(self, cell):
+        cols = self.cols
+        x = cell % cols
+        if cell + cols < self.size:
+            yield cell + cols
+        if x + 1 < cols:
+            yield cell + 1
+        if cell >= cols:
+            yield cell - cols
+        if x > 0:
+            yield cell - 1
+
+    def is_open(self, x, y):
+        """Walkable for ghosts and the search agents (anything but a wall)"""
+        return 0 <= x < self.cols and 0 <= y < self.rows and self.passable[y * self.cols + x] == 1
+
+    def is_path(self, x, y):
+        """Walkable for players (plain path tiles only)"""
+        return self.get(x, y) == PATH
+
+    def open_neighbors(self, pos):
+        """Walkable (x, y) tiles next to pos, in NEIGHBOR_OFFSETS order"""
+        x, y = pos
+        if not (0 <= x < self.cols and 0 <= y < self.rows):
+            return []
+        cols = self.cols
+        return [(n % cols, n // cols) for n in self.neighbors[y * cols + x]]
+
+    def snapshot(self):
+        """Read-only copy of the current layout with the same version, for planning off the main thread"""
+        maze = Maze.from_buffer(self.rows, self.cols, bytes(self.cells))
+        maze.version = self.version
+        return maze
+
+    def as_array(self):
+        """(rows, cols) uint8 NumPy view of the cells, for vectorized code"""
+        return np.frombuffer(self.cells, dtype=np.uint8).reshape(self.rows, self.cols)
+
+
+# --- Maze generation (used by the game and the trainer) ---
+def generate_maze(maze, r, c, rng=random):
+    """Carve passages with a randomized depth-first walk from (row r, col c)"""
+    maze.set(c, r, PATH)
+    dirs = [(0, 2), (0, -2), (2, 0), (-2, 0)]
+    rng.shuffle(dirs)
+
+    for dr, dc in dirs:
+        nr, nc = r + dr, c + dc
+        if 0 <= nr < maze.rows and 0 <= nc < maze.cols and maze.get(nc, nr) == WALL:
+            maze.set(c + dc // 2, r + dr // 2, PATH)
+            generate_maze(maze, nr, nc, rng)
+
+def reserve_ghost_box(maze):
+    """Clear the ghost cage area in the middle of the maze"""
+    mid_r, mid_c = maze.rows // 2, maze.cols // 2
+    for r in range(mid_r - 1, mid_r + 2):
+        for c in range(mid_c - 2, mid_c + 3):
+            maze.set(c, r, PATH)  # Make it a path (not wall)
+
+def remove_dead_ends(maze, iterations=30, rng=random):
+    """Open a wall next to every dead end so the maze gets loops"""
+    for _ in range(iterations):
+        for r in range(1, maze.rows - 1):
+            for c in range(1, maze.cols - 1):
+                if maze.get(c, r) == PATH:
+                    neighbors = [(r+1, c), (r-1, c), (r, c+1), (r, c-1)]
+                    walls = [maze.get(nc, nr) for nr, nc in neighbors]
+                    if walls.count(WALL) == 3:  # It's a dead end
+                        rng.shuffle(neighbors)
+                        for nr, nc in neighbors:
+                            if maze.get(nc, nr) == WALL:
+                                maze.set(nc, nr, PATH)
+                                break
+
+def mark_cage_walls(maze):
+    """Mark the cage outline as CAGE_WALL: players are blocked, ghosts pass"""
+    mid_r, mid_c = maze.rows // 2, maze.cols // 2
+    for r in range(mid_r - 1, mid_r + 3):  # Left and right walls
+        maze.set(mid_c - 2, r, CAGE_WALL)
+        maze.set(mid_c + 3, r, CAGE_WALL)
+    for c in range(mid_c - 2, mid_c + 4):  # Top and bottom walls
+        maze.set(c, mid_r - 1, CAGE_WALL)
+        maze.set(c, mid_r + 2, CAGE_WALL)
+
+def build_maze(maze, rng=random, dead_end_passes=50):
+    """Regenerate a full game layout in place: passages, cage area, loops and cage walls"""
+    maze.fill(WALL)
+    generate_maze(maze, 1, 1, rng)
+    reserve_ghost_box(maze)
+    remove_dead_ends(maze, dead_end_passes, rng)
+    mark_cage_walls(maze)
+
+# --- Nearest open tiles ---
+class NearestOpenTiles:
+    """Nearest open tile to every cell of one layout, counting grid steps through walls.
+
+    Built with one breadth-first sweep started from every open tile at once,
+    so each cell is labelled with the open tile whose wave reaches it first.
+    Moving an entity that new walls have buried is then a single lookup.
+    Open means walkable by ghosts (anything but WALL), or by players (PATH)
+    when `players` is set.
+    """
+    def __init__(self, maze, players=False):
+        self.rows = maze.rows
+        self.cols = maze.cols
+        if players:
+            self.is_open = [value == PATH for value in maze.cells]
+        else:
+            self.is_open = [bool(value) for value in maze.passable]
+        self.nearest = [-1] * maze.size
+        queue = deque()
+        for cell in range(maze.size):
+            if self.is_open[cell]:
+                self.nearest[cell] = cell
+                queue.append(cell)
+        while queue:
+            cell = queue.popleft()
+            for neighbor in self._grid_neighbors(cell):
+                if self.nearest[neighbor] == -1:
+                    self.nearest[neighbor] = self.nearest[cell]
+                    queue.append(neighbor)
+
+    def _grid_neighbors(self, cell):
+        x, y = cell % self.cols, cell // self.cols
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.cols and 0 <= ny < self.rows:
+                yield ny * self.cols + nx
+
+    def _cell(self, pos):
+        """Cell id of pos, clamped into the grid"""
+        x = min(max(pos[0], 0), self.cols - 1)
+        y = min(max(pos[1], 0), self.rows - 1)
+        return y * self.cols + x
+
+    def nearest_to(self, pos):
+        """Closest open (x, y) tile to pos, or None if the maze has none"""
+        cell = self.nearest[self._cell(pos)]
+        return None if cell == -1 else (cell % self.cols, cell // self.cols)
+
+    def assign(self, positions, unique=False, taken=()):
+        """A tile for each position: itself if open, else the nearest open tile.
+
+        Entities already on open tiles stay put. With `unique`, displaced
+        ones also avoid tiles another entity holds or was given, and the
+        `taken` tiles (e.g. those of another group of entities).
+        """
+        tiles = [None] * len(positions)
+        taken = set(taken)
+        for i, pos in enumerate(positions):
+            if pos == self.nearest_to(pos):
+                tiles[i] = pos
+                taken.add(pos)
+        for i, pos in enumerate(positions):
+            if tiles[i] is None:
+                tile = self.nearest_to(pos)
+                if unique and tile in taken:
+                    tile = self._nearest_free(pos, taken)
+                tiles[i] = tile
+                taken.add(tile)
+        return tiles
+
+    def _nearest_free(self, pos, taken):
+        """Closest open tile not in `taken`; a local search, only needed when two entities clash"""
+        start = self._cell(pos)
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            tile = (cell % self.cols, cell // self.cols)
+            if self.is_open[cell] and tile not in taken:
+                return tile
+            for neighbor in self._grid_neighbors(cell):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+        return self.nearest_to(pos)
+
+# (layout hash, players) -> NearestOpenTiles, most recent last
+_nearest_open = {}
+
+def nearest_open_tiles(maze, players=False):
+    """Cached NearestOpenTiles for the maze's current layout"""
+    key = (maze.layout_hash, players)
+    index = _nearest_open.pop(key, None)
+    if index is None:
+        index = NearestOpenTiles(maze, players)
+    _nearest_open[key] = index
+    while len(_nearest_open) > 4:
+        del _nearest_open[next(iter(_nearest_open))]
+    return index
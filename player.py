@@ -109,12 +109,10 @@ class Player:
         new_x = self.x + dx
         new_y = self.y + dy
 
-        # Check boundaries and avoid the other player
-        if (0 <= new_y < len(self.maze) and
-            0 <= new_x < len(self.maze[0]) and
-            (new_x, new_y) != other_player_pos):
+        # Avoid the other player (tiles outside the maze read as walls)
+        if (new_x, new_y) != other_player_pos:
             
-            if self.maze[new_y][new_x] == 0:  # 0 = walkable path
+            if self.maze.is_path(new_x, new_y):  # 0 = walkable path
                 self.x = new_x
                 self.y = new_y
                 self.target_x = new_x * self.tile_size
@@ -217,13 +215,9 @@ class Player:
         if not self.alive or self.respawn_timer > 0:
             return  # Don't draw if dead or respawning
 
-        # Select current sprite frame
+        # Select current sprite frame, pre-scaled by load_sprite_sheet(tile_size)
         sprite = self.frames[self.direction][self.current_frame]
 
-        # Resize sprite if needed
-        if sprite.get_size() != (self.tile_size, self.tile_size):
-            sprite = pygame.transform.scale(sprite, (self.tile_size, self.tile_size))
-
         # Center the sprite using interpolated position
         offset = (self.tile_size - sprite.get_width()) // 2
         surface.blit(sprite, (self.current_x + offset, self.current_y + offset))
@@ -0,0 +1,133 @@
+"""Trained ghost policies stored as small binary .pmp files.
+
+Layout (little-endian):
+
+    magic      4s   b'PMPL'
+    version    H    FORMAT_VERSION
+    ghost_id   B    ghost the policy was trained for
+    flags      B    reserved, 0
+    count      I    number of moves
+    start_x    h    tile the moves start from, -1 if any
+    start_y    h
+    maze_hash  Q    Maze.layout_hash it was trained on, 0 if any maze
+
+followed by `count` direction codes (indexes into DIRECTIONS) packed four
+to a byte, lowest bits first. Files are opened once with mmap and kept in
+a module-level cache, so building ghosts again on a reset does no I/O.
+"""
+import mmap
+import os
+import struct
+import numpy as np
+from search_agents import DIRECTIONS
+
+MAGIC = b'PMPL'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHBBIhhQ')
+SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+class Policy:
+    """One trained move sequence, read from a memory-mapped .pmp file"""
+    def __init__(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise ValueError("policy file too short")
+        magic, version, ghost_id, _, count, start_x, start_y, maze_hash = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("not a policy file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported policy version {version}")
+        if len(buffer) < HEADER.size + (count + 3) // 4:
+            raise ValueError("policy file truncated")
+        self.buffer = buffer
+        self.ghost_id = ghost_id
+        self.count = count
+        self.start = (start_x, start_y) if start_x >= 0 else None
+        self.maze_hash = maze_hash
+        self._codes = None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def codes(self):
+        """int8 direction codes, unpacked on first use"""
+        if self._codes is None:
+            packed = np.frombuffer(self.buffer, dtype=np.uint8, count=(self.count + 3) // 4, offset=HEADER.size)
+            self._codes = ((packed[:, None] >> SHIFTS) & 3).astype(np.int8).ravel()[:self.count]
+        return self._codes
+
+    def directions(self):
+        return [DIRECTIONS[code] for code in self.codes]
+
+    def matches(self, maze):
+        """True if the policy was trained for any maze or for this exact layout"""
+        return self.maze_hash == 0 or self.maze_hash == maze.layout_hash
+
+def pack_policy(codes, ghost_id, start=None, maze_hash=0):
+    """Bytes of a .pmp file holding `codes`"""
+    codes = np.asarray(codes, dtype=np.uint8)
+    if len(codes) and codes.max() >= len(DIRECTIONS):
+        raise ValueError("direction code out of range")
+    padded = np.zeros((len(codes) + 3) // 4 * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    packed = np.bitwise_or.reduce(padded.reshape(-1, 4) << SHIFTS, axis=1).astype(np.uint8)
+    start_x, start_y = start if start is not None else (-1, -1)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, ghost_id, 0, len(codes), start_x, start_y, maze_hash)
+    return header + packed.tobytes()
+
+def save_policy(path, codes, ghost_id, start=None, maze_hash=0):
+    """Write a .pmp file atomically and drop any cached copy of it"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(pack_policy(codes, ghost_id, start, maze_hash))
+    os.replace(temp, path)
+    _policies.pop(path, None)
+    _listings.clear()
+
+# --- Shared cache ---
+# Path -> Policy, or None if the file was missing or invalid
+_policies = {}
+# Directory -> names of the .pmp files in it, listed once
+_listings = {}
+
+def load_policy(path):
+    """Cached Policy for `path`, or None. Each path is opened at most once"""
+    if path in _policies:
+        return _policies[path]
+    policy = None
+    try:
+        with open(path, 'rb') as f:
+            policy = Policy(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except FileNotFoundError:
+        pass
+    except ValueError as e:  # Also raised by mmap for an empty file
+        print(f"Ignoring trained policy {path}: {e}")
+    _policies[path] = policy
+    return policy
+
+def policy_path(directory, ghost_id, maze=None):
+    """File name for a ghost's policy, specific to one maze layout if given"""
+    if maze is None:
+        return os.path.join(directory, f"ghost_{ghost_id}.pmp")
+    return os.path.join(directory, f"ghost_{ghost_id}_{maze.layout_hash:016x}.pmp")
+
+def find_policy(directory, ghost_id, maze):
+    """The policy trained for this maze layout if there is one, else the general one.
+
+    The directory is listed on the first call only, so looking up a new
+    layout costs a set lookup rather than a failed open().
+    """
+    if directory not in _listings:
+        try:
+            _listings[directory] = {name for name in os.listdir(directory) if name.endswith('.pmp')}
+        except FileNotFoundError:
+            _listings[directory] = set()
+    for path in (policy_path(directory, ghost_id, maze), policy_path(directory, ghost_id)):
+        if os.path.basename(path) in _listings[directory]:
+            policy = load_policy(path)
+            if policy is not None and policy.matches(maze):
+                return policy
+    return None
@@ -0,0 +1,173 @@
+"""Optimal single-ghost pursuit, solved offline for a whole maze.
+
+For one maze the (ghost cell, Pac-Man cell) state space is small, so the
+game can be solved outright. Ghost and Pac-Man take turns: the ghost must
+step to a neighboring tile, Pac-Man may step or stay. solve_pursuit() runs
+value iteration over every state pair at once and keeps, for each pair,
+the number of ghost moves to a guaranteed capture and the move that
+achieves it. In loops an evading Pac-Man can never be caught by one ghost;
+those states keep NEVER and their move is a shortest-path step instead.
+
+Tables are saved as one .npy per layout and loaded with mmap, so a ghost
+decision is two array reads:
+
+    python pursuit.py --mazes 5 --seed 0 --output policies
+"""
+import argparse
+import os
+import random
+import time
+import numpy as np
+from maze import Maze, PATH, build_maze
+from search_agents import DistanceTable
+
+NEVER = -1  # Capture time of a state one ghost cannot force
+
+class PursuitTable:
+    """Best ghost move and capture time for every (ghost cell, Pac-Man cell) pair.
+
+    `moves[g, p]` is the cell id to step to (-1 once caught) and `values[g, p]`
+    the moves to capture with the ghost to move, or NEVER. Both are int16
+    planes of one array, which may be a read-only memory map.
+    """
+    def __init__(self, data, cols):
+        self.data = data
+        self.moves = data[0]
+        self.values = data[1]
+        self.cols = cols
+
+    def next_step(self, ghost_pos, pacman_pos):
+        """Tile the ghost should step to, or None"""
+        g = ghost_pos[1] * self.cols + ghost_pos[0]
+        p = pacman_pos[1] * self.cols + pacman_pos[0]
+        if not (0 <= g < len(self.moves) and 0 <= p < len(self.moves)):
+            return None
+        hop = int(self.moves[g, p])
+        return None if hop < 0 else (hop % self.cols, hop // self.cols)
+
+    def capture_time(self, ghost_pos, pacman_pos):
+        """Ghost moves to a forced capture, or None if Pac-Man can escape forever"""
+        value = int(self.values[ghost_pos[1] * self.cols + ghost_pos[0],
+                                pacman_pos[1] * self.cols + pacman_pos[0]])
+        return None if value == NEVER else value
+
+    def stats(self):
+        """Share of catchable states and their mean and worst capture time"""
+        caught = self.values[self.values > 0]
+        return {'states': int((self.moves >= 0).sum()),
+                'catchable': int(caught.size),
+                'mean_moves': float(caught.mean()) if caught.size else 0.0,
+                'max_moves': int(caught.max()) if caught.size else 0}
+
+def _padded_neighbors(neighbor_lists, index, count, include_self):
+    """Compact neighbor ids as a (count, width) array, padded with a repeat"""
+    width = 5 if include_self else 4
+    table = np.empty((count, width), dtype=np.int32)
+    for i, hops in enumerate(neighbor_lists):
+        hops = [int(index[h]) for h in hops]
+        if include_self:
+            hops.append(i)
+        hops = hops or [i]
+        table[i] = (hops * width)[:width]
+    return table
+
+def solve_pursuit(maze, distance_table=None):
+    """PursuitTable for the maze's current layout, by vectorized value iteration"""
+    size = maze.size
+    cells = np.flatnonzero(np.frombuffer(bytes(maze.passable), dtype=np.uint8))
+    count = len(cells)
+    index = np.full(size, -1, dtype=np.int32)
+    index[cells] = np.arange(count)
+
+    # Ghosts walk anything but walls; Pac-Man walks paths and may stand still
+    ghost_next = _padded_neighbors([maze.neighbors[c] for c in cells], index, count, False)
+    pacman_next = _padded_neighbors(
+        [[h for h in maze.neighbors[c] if maze.cells[h] == PATH] for c in cells], index, count, True)
+
+    # values[g, p]: ghost moves to capture with the ghost to move
+    infinity = np.int32(count * count + 1)
+    diagonal = np.arange(count)
+    values = np.full((count, count), infinity, dtype=np.int32)
+    values[diagonal, diagonal] = 0
+    while True:
+        # after[g, p]: ghost has just moved to g, Pac-Man picks the worst reply
+        after = values[:, pacman_next].max(axis=2)
+        after[diagonal, diagonal] = 0
+        updated = np.minimum(after[ghost_next].min(axis=1) + 1, infinity)
+        updated[diagonal, diagonal] = 0
+        if np.array_equal(updated, values):
+            break
+        values = updated
+
+    # Best move: fastest forced capture, ties and hopeless states by distance
+    if distance_table is None or distance_table.version != maze.version:
+        distance_table = DistanceTable(maze)
+    dist = distance_table.dist[np.ix_(cells, cells)].astype(np.int64)
+    dist[dist < 0] = size
+    key = after[ghost_next].astype(np.int64) * (size + 1) + dist[ghost_next]  # (g, k, p)
+    best = ghost_next[diagonal[:, None], key.argmin(axis=1)]
+
+    data = np.full((2, size, size), -1, dtype=np.int16)
+    moves = cells[best].astype(np.int16)
+    moves[diagonal, diagonal] = -1
+    data[0][np.ix_(cells, cells)] = moves
+    data[1][np.ix_(cells, cells)] = np.where(values >= infinity, NEVER, values)
+    return PursuitTable(data, maze.cols)
+
+# --- Storage ---
+def table_path(directory, maze):
+    return os.path.join(directory, f"pursuit_{maze.layout_hash:016x}.npy")
+
+def save_pursuit_table(path, table):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    temp = path + '.tmp.npy'
+    np.save(temp, table.data)
+    os.replace(temp, path)
+
+# Layout hash -> PursuitTable, most recent last
+_tables = {}
+_TABLE_CACHE_SIZE = 4
+
+def pursuit_table(maze, directory='policies', distance_table=None):
+    """Table for the maze's layout: cached, else memory-mapped from disk, else solved now"""
+    table = _tables.pop(maze.layout_hash, None)
+    if table is None:
+        path = table_path(directory, maze)
+        if os.path.exists(path):
+            data = np.load(path, mmap_mode='r')
+            if data.shape == (2, maze.size, maze.size):
+                table = PursuitTable(data, maze.cols)
+        if table is None:
+            table = solve_pursuit(maze, distance_table)
+    _tables[maze.layout_hash] = table
+    while len(_tables) > _TABLE_CACHE_SIZE:
+        del _tables[next(iter(_tables))]
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve optimal pursuit tables for generated mazes.")
+    parser.add_argument('--mazes', type=int, default=1)
+    parser.add_argument('--rows', type=int, default=21)
+    parser.add_argument('--cols', type=int, default=21)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='policies', help="directory for the .npy tables")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    for _ in range(args.mazes):
+        maze = Maze(args.rows, args.cols)
+        build_maze(maze, rng)
+        started = time.perf_counter()
+        table = solve_pursuit(maze)
+        elapsed = time.perf_counter() - started
+        path = table_path(args.output, maze)
+        save_pursuit_table(path, table)
+        stats = table.stats()
+        print(f"{path}: solved in {elapsed:.2f}s, {stats['catchable']}/{stats['states']} states catchable, "
+              f"mean {stats['mean_moves']:.1f} moves, worst {stats['max_moves']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+class AIScheduler:
+    """Spreads AI planning over frames under a fixed time budget per frame.
+
+    Ghosts call request() when they need a new plan, and the main loop calls
+    run() once per frame. Requests run most urgent first, and waiting raises
+    a request's priority by `aging` per frame, so every request gets its turn.
+    A request is held back when its estimated cost (a running average of its
+    past runs) would overrun the budget. At least one request runs per frame,
+    so even a planner that costs more than the budget gets its turn.
+    Ghosts left waiting keep following the path they already have.
+    """
+    def __init__(self, budget_ms=4.0, aging=1.0, history=600):
+        self.budget = budget_ms / 1000.0
+        self.aging = aging
+        self.queue = []  # Heap of [priority, order, key]
+        self.pending = {}  # Key -> latest task for it
+        self.costs = {}  # Key -> average seconds per run
+        self.order = itertools.count()
+        self.frame = 0
+        self.deadline = 0.0  # End of the current frame's budget, set by run()
+        self.frame_times = deque(maxlen=history)  # AI seconds spent in each recent frame
+        self.stats = {'runs': 0, 'deferred': 0}
+
+    def request(self, key, task, urgency=0.0):
+        """Queue task() under key. Higher urgency runs sooner.
+
+        A new request for a key that is still waiting only replaces its task,
+        so the key keeps the place in line it has earned.
+        """
+        if key not in self.pending:
+            # Aging adds the same amount to every waiting request each frame,
+            # so it can be folded into a fixed heap priority at request time
+            priority = self.aging * self.frame - urgency
+            heapq.heappush(self.queue, [priority, next(self.order), key])
+        self.pending[key] = task
+
+    def cancel(self, key):
+        """Drop a waiting request, e.g. for a ghost that was reset"""
+        self.pending.pop(key, None)
+
+    def clear(self):
+        self.queue = []
+        self.pending = {}
+
+    def remaining(self):
+        """Seconds left in the current frame's budget, for planners with their own time limit"""
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def run(self):
+        """Run waiting requests until this frame's budget is used; returns how many ran"""
+        start = time.perf_counter()
+        deadline = self.deadline = start + self.budget
+        ran = 0
+        while self.queue:
+            key = self.queue[0][2]
+            if key not in self.pending:  # Cancelled
+                heapq.heappop(self.queue)
+                continue
+            now = time.perf_counter()
+            if ran and now + self.costs.get(key, 0.0) > deadline:
+                break
+            heapq.heappop(self.queue)
+            self.pending.pop(key)()
+            cost = time.perf_counter() - now
+            self.costs[key] = cost if key not in self.costs else 0.8 * self.costs[key] + 0.2 * cost
+            ran += 1
+        self.stats['runs'] += ran
+        self.stats['deferred'] += len(self.pending)
+        self.frame_times.append(time.perf_counter() - start)
+        self.frame += 1
+        return ran
+
+    def percentile(self, fraction):
+        """AI milliseconds per frame at the given fraction (0.99 for p99) of recent frames"""
+        if not self.frame_times:
+            return 0.0
+        times = sorted(self.frame_times)
+        return times[min(len(times) - 1, int(fraction * len(times)))] * 1000.0
+
+class AsyncPlanner:
+    """Runs ghost planning on background worker threads against maze snapshots.
+
+    submit() hands a job a read-only snapshot of the maze, shared by all
+    jobs until the maze version changes, and returns at once. The ghost
+    keeps following its current path and collects the result with result()
+    on a later frame. A result computed for an older maze version is thrown
+    away. One worker by default, so planners that share caches (the minimax
+    transposition table, the layout caches) never run concurrently.
+    """
+    def __init__(self, workers=1):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ghost-ai')
+        self.jobs = {}  # Key -> (future, maze version it was planned on)
+        self.snapshot = None
+        self.stats = {'submitted': 0, 'applied': 0, 'stale': 0}
+
+    def snapshot_of(self, maze):
+        if self.snapshot is None or self.snapshot.version != maze.version:
+            self.snapshot = maze.snapshot()
+        return self.snapshot
+
+    def busy(self, key):
+        return key in self.jobs
+
+    def submit(self, key, task, maze, *args):
+        """Start task(snapshot, *args) unless a job for key is still running"""
+        if key in self.jobs:
+            return False
+        snapshot = self.snapshot_of(maze)
+        self.jobs[key] = (self.pool.submit(task, snapshot, *args), snapshot.version)
+        self.stats['submitted'] += 1
+        return True
+
+    def result(self, key, maze):
+        """The finished job's return value, or None if it is still running or outdated.
+
+        Errors raised by the job are raised here, on the main thread.
+        """
+        job = self.jobs.get(key)
+        if job is None or not job[0].done():
+            return None
+        del self.jobs[key]
+        future, version = job
+        if version != maze.version:
+            self.stats['stale'] += 1
+            return None
+        self.stats['applied'] += 1
+        return future.result()
+
+    def clear(self):
+        """Forget every running job; their results will be ignored"""
+        self.jobs = {}
+
+    def shutdown(self):
+        self.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -1,175 +1,716 @@
-from collections import deque
+from collections import deque, OrderedDict
 import heapq
 import random
 import time
+import numpy as np
+from maze import NEIGHBOR_OFFSETS, WALL, PATH
 
 # --- BFS Algorithm ---
-def bfs(start, goal, maze):
-    queue = deque([(start, [])])
-    visited = set([start])
-    
+def reconstruct_path(parent, start_id, goal_id, cols):
+    """Walk a predecessor array back from goal to start (start excluded)"""
+    path = []
+    current = goal_id
+    while current != start_id:
+        path.append((current % cols, current // cols))
+        current = parent[current]
+    path.reverse()
+    return path
+
+def bfs_multi(start, goals, maze):
+    """BFS to whichever goal is reached first, returning the path to it.
+
+    Uses a predecessor array over flattened cell ids instead of copying a
+    path per queue entry, and stops as soon as a goal is discovered.
+    """
+    cols, rows = maze.cols, maze.rows
+    sx, sy = start
+    if not (0 <= sx < cols and 0 <= sy < rows):
+        return []
+    goal_ids = {gy * cols + gx for gx, gy in goals if 0 <= gx < cols and 0 <= gy < rows}
+    start_id = sy * cols + sx
+    if start_id in goal_ids or not goal_ids:
+        return []
+
+    neighbors = maze.neighbors
+    parent = [-1] * maze.size
+    parent[start_id] = start_id
+    queue = deque([start_id])
+
     while queue:
-        (x, y), path = queue.popleft()
-        
-        if (x, y) == goal:
-            return path
-        
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            nx, ny = x + dx, y + dy
-            if (0 <= nx < len(maze[0]) and 0 <= ny < len(maze) and
-                (nx, ny) not in visited and maze[ny][nx] != 1):  # Changed from == 0 to != 1
-                visited.add((nx, ny))
-                queue.append(((nx, ny), path + [(nx, ny)]))
-    
+        current = queue.popleft()
+        # Same neighbor order as before: down, right, up, left
+        for nxt in neighbors[current]:
+            if parent[nxt] == -1:
+                parent[nxt] = current
+                if nxt in goal_ids:
+                    return reconstruct_path(parent, start_id, nxt, cols)
+                queue.append(nxt)
+
     return []
 
+def bfs(start, goal, maze):
+    return bfs_multi(start, (goal,), maze)
+
 
 # --- A* Algorithm ---
-class Node:
-    def __init__(self, x, y, parent=None):
-        self.x = x
-        self.y = y
-        self.parent = parent
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __lt__(self, other):
-        return self.f < other.f
-
-def astar(start, goal, maze):
-    open_list = []
-    closed_set = set()
-
-    start_node = Node(*start)
-    goal_node = Node(*goal)
-    heapq.heappush(open_list, start_node)
+def astar(start, goal, maze, stats=None):
+    """A* search returning the path from start to goal, both included.
+
+    Best g-scores are kept in an array indexed by flattened cell id, so a
+    cell is only pushed again when a cheaper route to it is found and stale
+    heap entries are skipped when popped. Heap entries are (f, h, id)
+    tuples, so ties on f go to the cell closest to the goal. If a stats
+    dict is given, 'searches' and 'expanded' are added to it.
+    """
+    cols, rows = maze.cols, maze.rows
+    sx, sy = start
+    gx, gy = goal
+    if stats is not None:
+        stats['searches'] = stats.get('searches', 0) + 1
+    if start == goal:
+        return [start]
+    if not (0 <= sx < cols and 0 <= sy < rows and 0 <= gx < cols and 0 <= gy < rows):
+        return []
+
+    size = maze.size
+    neighbors = maze.neighbors
+    start_id = sy * cols + sx
+    goal_id = gy * cols + gx
+    g_score = [-1] * size
+    parent = [-1] * size
+    closed = bytearray(size)
+    g_score[start_id] = 0
+    h = abs(gx - sx) + abs(gy - sy)
+    open_list = [(h, h, start_id)]
+    expanded = 0
 
     while open_list:
-        current = heapq.heappop(open_list)
-        if (current.x, current.y) == (goal_node.x, goal_node.y):
-            path = []
-            while current:
-                path.append((current.x, current.y))
-                current = current.parent
-            return path[::-1]
-
-        closed_set.add((current.x, current.y))
-
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            nx, ny = current.x + dx, current.y + dy
-            if (0 <= nx < len(maze[0]) and 0 <= ny < len(maze) and
-                (nx, ny) not in closed_set and maze[ny][nx] != 1):  # Changed from == 0 to != 1
-                neighbor = Node(nx, ny, current)
-                neighbor.g = current.g + 1
-                neighbor.h = abs(goal_node.x - nx) + abs(goal_node.y - ny)
-                neighbor.f = neighbor.g + neighbor.h
-                heapq.heappush(open_list, neighbor)
+        f, h, current = heapq.heappop(open_list)
+        if closed[current]:
+            continue  # Stale entry, a cheaper copy was already expanded
+        if current == goal_id:
+            break
+        closed[current] = 1
+        expanded += 1
 
-    return []
+        g = g_score[current] + 1
+        for nxt in neighbors[current]:
+            if not closed[nxt] and (g_score[nxt] == -1 or g < g_score[nxt]):
+                g_score[nxt] = g
+                parent[nxt] = current
+                h = abs(gx - nxt % cols) + abs(gy - nxt // cols)
+                heapq.heappush(open_list, (g + h, h, nxt))
+    else:
+        current = -1
+
+    if stats is not None:
+        stats['expanded'] = stats.get('expanded', 0) + expanded
+    if current != goal_id:
+        return []
+    return [start] + reconstruct_path(parent, start_id, goal_id, cols)
+
+
+# --- Incremental A* for moving targets ---
+class IncrementalAStar:
+    """A* that keeps its search tree between calls while chasing a moving target.
+
+    The tree is rooted at the chaser. When only the target moves, the open
+    list is re-keyed for the new heuristic and the search resumes from the
+    old frontier, so a target already inside the tree costs no expansions.
+    When the chaser steps onto an expanded tile, the tree is re-rooted there:
+    that tile's subtree keeps its g-scores (shifted, since subpaths of
+    shortest paths are shortest) and everything else is dropped. When the
+    maze version changes (e.g. Gate.break_gate), the tiles whose
+    passability changed are repaired with update_cells().
+    """
+    def __init__(self, maze):
+        self.maze = maze
+        self.cols, self.rows = maze.cols, maze.rows
+        self.passable = bytearray(maze.passable)  # Snapshot the tree was built on
+        self.version = maze.version
+        self.stats = {'searches': 0, 'expanded': 0, 'reroots': 0, 'resets': 0}
+        self.reset()
+
+    def reset(self):
+        """Drop the whole search tree"""
+        size = self.cols * self.rows
+        self.root = -1
+        self.goal = -1
+        self.g = [-1] * size
+        self.parent = [-1] * size
+        self.closed = bytearray(size)
+        self.open_list = []
+        self.tree = []  # Every discovered cell, so repairs never scan the whole grid
+
+    def plan(self, start, goal):
+        """Shortest path from start to goal excluding start, in the same format as bfs"""
+        cols, rows = self.cols, self.rows
+        sx, sy = start
+        gx, gy = goal
+        if start == goal or not (0 <= sx < cols and 0 <= sy < rows and 0 <= gx < cols and 0 <= gy < rows):
+            return []
+        start_id = sy * cols + sx
+        goal_id = gy * cols + gx
+        if self.maze.version != self.version:
+            self._sync()
+        if not self.passable[goal_id]:
+            return []
+        self.stats['searches'] += 1
+
+        if start_id != self.root:
+            if self.root >= 0 and self.closed[start_id]:
+                self._reroot(start_id)
+            else:
+                self._restart(start_id)
+        if goal_id != self.goal:
+            self.goal = goal_id
+            self._rekey()
+        if not self.closed[goal_id]:
+            self._search()
+        if not self.closed[goal_id]:
+            return []
+        return reconstruct_path(self.parent, self.root, goal_id, cols)
+
+    def _sync(self):
+        """Catch up with changes made to the maze since the last plan"""
+        self.version = self.maze.version
+        if self.maze.passable == self.passable:
+            return  # e.g. a cage wall value changed, walkability did not
+        changed = [self.maze.position(cell) for cell, (old, new)
+                   in enumerate(zip(self.passable, self.maze.passable)) if old != new]
+        self.update_cells(changed)
+
+    def update_cells(self, cells):
+        """Re-read the given (x, y) tiles from the maze and repair the tree around them"""
+        for x, y in cells:
+            cell = y * self.cols + x
+            passable = self.maze.passable[cell] == 1
+            if passable == bool(self.passable[cell]):
+                continue
+            self.passable[cell] = passable
+            if self.root < 0:
+                continue
+            if not passable:
+                if self.g[cell] != -1:
+                    self._prune(cell)
+            else:
+                # A new opening anywhere can create a shortcut to tiles that are
+                # already closed (through cells the tree never reached), and
+                # closed tiles are never reopened, so start the tree over
+                self.stats['resets'] += 1
+                self.reset()
+
+    def _heuristic(self, cell):
+        goal = self.goal
+        return abs(cell % self.cols - goal % self.cols) + abs(cell // self.cols - goal // self.cols)
+
+    def _restart(self, root):
+        self.stats['resets'] += 1
+        goal = self.goal
+        self.reset()
+        self.goal = goal
+        self.root = root
+        self.g[root] = 0
+        self.parent[root] = root
+        self.tree.append(root)
+        self._rekey()
+
+    def _open_cells(self):
+        g, closed = self.g, self.closed
+        return {cell for _, _, cost, cell in self.open_list if not closed[cell] and g[cell] == cost}
+
+    def _rekey(self):
+        """Rebuild the open list for the current goal's heuristic"""
+        cells = self._open_cells() if self.open_list else set()
+        if self.root >= 0 and not self.closed[self.root]:
+            cells.add(self.root)
+        if self.goal < 0:
+            self.open_list = [(self.g[c], 0, self.g[c], c) for c in cells]
+        else:
+            self.open_list = [(self.g[c] + self._heuristic(c), self._heuristic(c), self.g[c], c)
+                              for c in cells]
+        heapq.heapify(self.open_list)
+
+    def _subtree(self, top):
+        """Flags for every discovered cell whose tree path passes through top"""
+        parent = self.parent
+        member = {top: True}
+        member.setdefault(self.root, False)
+        for cell in self.tree:
+            if cell in member:
+                continue
+            chain = []
+            while cell not in member:
+                chain.append(cell)
+                cell = parent[cell]
+            inside = member[cell]
+            for c in chain:
+                member[c] = inside
+        return member
+
+    def _rebuild(self, member, keep_inside, shift=0):
+        """Keep one side of a subtree split, then reseed the open list around it"""
+        g, parent, closed = self.g, self.parent, self.closed
+        open_cells = self._open_cells()
+        kept = []
+        for cell in self.tree:
+            if member[cell] != keep_inside:
+                g[cell] = -1
+                parent[cell] = -1
+                closed[cell] = 0
+                open_cells.discard(cell)
+            else:
+                g[cell] -= shift
+                kept.append(cell)
+        self.tree = kept
+        # Tiles next to expanded ones must be on the open list with their best g
+        neighbors = self.maze.neighbors
+        for cell in [c for c in kept if closed[c]]:
+            for n in neighbors[cell]:
+                if not closed[n] and (g[n] == -1 or g[cell] + 1 < g[n]):
+                    if g[n] == -1:
+                        kept.append(n)
+                    g[n] = g[cell] + 1
+                    parent[n] = cell
+                    open_cells.add(n)
+        self.open_list = [(g[c], 0, g[c], c) for c in open_cells]
+        self._rekey()
+
+    def _reroot(self, new_root):
+        self.stats['reroots'] += 1
+        member = self._subtree(new_root)
+        shift = self.g[new_root]
+        self.root = new_root
+        self._rebuild(member, keep_inside=True, shift=shift)
+        self.parent[new_root] = new_root
+
+    def _prune(self, blocked):
+        if blocked == self.root:
+            self.reset()
+            return
+        self._rebuild(self._subtree(blocked), keep_inside=False)
+
+    def _search(self):
+        g, parent, closed = self.g, self.parent, self.closed
+        neighbors = self.maze.neighbors  # In sync with self.passable after _sync()
+        open_list = self.open_list
+        tree = self.tree
+        cols = self.cols
+        gx, gy = self.goal % cols, self.goal // cols
+        goal = self.goal
+        expanded = 0
+        while open_list:
+            _, _, cost, current = heapq.heappop(open_list)
+            if closed[current] or g[current] != cost:
+                continue  # Stale entry
+            closed[current] = 1
+            expanded += 1
+            for n in neighbors[current]:
+                if not closed[n] and (g[n] == -1 or cost + 1 < g[n]):
+                    if g[n] == -1:
+                        tree.append(n)
+                    g[n] = cost + 1
+                    parent[n] = current
+                    h = abs(n % cols - gx) + abs(n // cols - gy)
+                    heapq.heappush(open_list, (cost + 1 + h, h, cost + 1, n))
+            if current == goal:
+                break
+        self.stats['expanded'] += expanded
+
+
+# --- Precomputed Distance Tables ---
+class DistanceTable:
+    """All-pairs shortest distances and next hops for one maze.
+
+    Cells are indexed by their flattened id (y * cols + x). Both tables are
+    built once per maze with a breadth-first sweep run from every cell at the
+    same time, so queries afterwards are plain array lookups.
+    """
+    UNREACHABLE = -1
+
+    def __init__(self, maze):
+        self.rows = maze.rows
+        self.cols = maze.cols
+        self.version = maze.version
+        size = maze.size
+        walkable = (maze.as_array() != WALL).ravel()  # Same rule as bfs/astar
+
+        # Neighbor id for each cell and direction, -1 for walls and borders
+        neighbors = np.full((size, len(NEIGHBOR_OFFSETS)), -1, dtype=np.int32)
+        ys, xs = np.divmod(np.arange(size), self.cols)
+        for k, (dx, dy) in enumerate(NEIGHBOR_OFFSETS):
+            nx, ny = xs + dx, ys + dy
+            inside = (nx >= 0) & (nx < self.cols) & (ny >= 0) & (ny < self.rows)
+            ids = np.where(inside, ny * self.cols + nx, 0)
+            neighbors[:, k] = np.where(inside & walkable & walkable[ids], ids, -1)
+        self.neighbors = neighbors
+
+        # Layered BFS from every source at once: row s holds distances from s.
+        # The frontier is a flat list of (source, cell) pairs, so every pair
+        # is expanded exactly once no matter how long the corridors are.
+        id_type = np.int16 if size < 2 ** 15 else np.int32
+        dist = np.full((size, size), self.UNREACHABLE, dtype=id_type)
+        flat_dist = dist.reshape(-1)
+        sources = np.flatnonzero(walkable)
+        frontier = sources * size + sources
+        flat_dist[frontier] = 0
+        step = 0
+        while frontier.size:
+            step += 1
+            source, cell = np.divmod(frontier, size)
+            hops = neighbors[cell].ravel()
+            pairs = np.repeat(source, neighbors.shape[1]) * size + hops
+            pairs = pairs[hops >= 0]
+            frontier = np.unique(pairs[flat_dist[pairs] == self.UNREACHABLE])
+            flat_dist[frontier] = step
+        self.dist = dist
+
+        # Next hop from s toward t is the first neighbor one step closer to t
+        next_hop = np.full((size, size), -1, dtype=id_type)
+        for k in range(neighbors.shape[1]):
+            cells = np.flatnonzero(neighbors[:, k] >= 0)
+            hops = neighbors[cells, k]
+            closer = ((dist[hops] == dist[cells] - 1) & (dist[cells] > 0) &
+                      (next_hop[cells] == -1))
+            rows, cols = np.nonzero(closer)
+            next_hop[cells[rows], cols] = hops[rows]
+        self.next_hop = next_hop
+
+    def cell_id(self, pos):
+        """Flattened id of an (x, y) tile, or None when outside the maze"""
+        x, y = pos
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return y * self.cols + x
+        return None
+
+    def position(self, cell_id):
+        """(x, y) tile of a flattened id"""
+        return (cell_id % self.cols, cell_id // self.cols)
+
+    def distance(self, start, goal):
+        """Shortest walking distance between two tiles, or None if unreachable"""
+        s, g = self.cell_id(start), self.cell_id(goal)
+        if s is None or g is None:
+            return None
+        d = int(self.dist[s, g])
+        return None if d == self.UNREACHABLE else d
+
+    def next_step(self, start, goal):
+        """First tile on a shortest path from start to goal, or None"""
+        s, g = self.cell_id(start), self.cell_id(goal)
+        if s is None or g is None:
+            return None
+        hop = int(self.next_hop[s, g])
+        return None if hop < 0 else self.position(hop)
+
+    def path(self, start, goal):
+        """Shortest path excluding start, in the same format as bfs"""
+        if self.distance(start, goal) is None:
+            return []
+        path = []
+        current = start
+        while current != goal:
+            current = self.next_step(current, goal)
+            path.append(current)
+        return path
+
+
+# --- Shared Flow Fields ---
+class FlowFields:
+    """Reverse BFS distance fields shared by every ghost, one per Pac-Man tile.
+
+    update() is called once per tick with the live Pac-Man positions and
+    only rebuilds a field when its target has moved to a new tile, so the
+    cost scales with the number of targets instead of the number of ghosts.
+    """
+    def __init__(self, maze):
+        self.stats = {'builds': 0}
+        self.set_maze(maze)
+
+    def set_maze(self, maze):
+        """Switch to another maze, dropping every field"""
+        self.maze = maze
+        self.cols, self.rows = maze.cols, maze.rows
+        self.version = maze.version
+        self.fields = {}
+
+    def update(self, targets):
+        """Keep one field per live target tile, building only the new ones"""
+        if self.maze.version != self.version:
+            self.set_maze(self.maze)  # Layout changed, every field is stale
+        fields = {}
+        for target in targets:
+            x, y = target
+            if not (0 <= x < self.cols and 0 <= y < self.rows):
+                continue  # Dead players are reported as (-1, -1)
+            fields[target] = self.fields.get(target) or self._build(y * self.cols + x)
+        self.fields = fields
+
+    def _build(self, target_id):
+        self.stats['builds'] += 1
+        neighbors = self.maze.neighbors
+        dist = [-1] * self.maze.size
+        dist[target_id] = 0
+        queue = deque([target_id])
+        while queue:
+            current = queue.popleft()
+            d = dist[current] + 1
+            for nxt in neighbors[current]:
+                if dist[nxt] == -1:
+                    dist[nxt] = d
+                    queue.append(nxt)
+        return dist
+
+    def distance(self, pos, target):
+        """Walking distance from pos to a tracked target, or None"""
+        field = self.fields.get(target)
+        x, y = pos
+        if field is None or not (0 <= x < self.cols and 0 <= y < self.rows):
+            return None
+        d = field[y * self.cols + x]
+        return None if d == -1 else d
+
+    def next_move(self, pos, target):
+        """Neighboring tile one step closer to a tracked target, or None"""
+        field = self.fields.get(target)  # Looked up once; update() may swap self.fields meanwhile
+        x, y = pos
+        if field is None or not (0 <= x < self.cols and 0 <= y < self.rows):
+            return None
+        here = field[y * self.cols + x]
+        if here <= 0:
+            return None
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = pos[0] + dx, pos[1] + dy
+            if 0 <= nx < self.cols and 0 <= ny < self.rows and field[ny * self.cols + nx] == here - 1:
+                return (nx, ny)
+        return None
 
 
 # --- Minimax Ghost Logic ---
-# Cache for minimax evaluations
-minimax_cache = {}
-move_cache = {}
+class TranspositionTable:
+    """Bounded cache of minimax results keyed by a Zobrist position hash.
+
+    A position's key XORs per-cell keys for the ghost and Pac-Man tiles,
+    a side-to-move key and the maze's Zobrist layout_hash (which changes
+    with every maze version that alters the layout), so results never leak
+    across regenerations. Entries keep their search depth, bound type and
+    best move.
+    A shallower result never replaces a deeper one for the same position,
+    and the least recently used entry is evicted once capacity is reached.
+    """
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, capacity=50000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.position_keys = {}  # Grid size -> [ghost keys, Pac-Man keys, side key]
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, ghost_pos, pacman_pos, maximizing, maze):
+        keys = self.position_keys.get(maze.size)
+        if keys is None:
+            # A stream of its own: seeding with the size alone would repeat the maze's
+            # layout keys, so a position key could cancel out a one-cell layout change
+            rng = random.Random(f"transposition-{maze.size}")
+            keys = [[rng.getrandbits(64) for _ in range(maze.size)] for _ in range(2)]
+            keys.append(rng.getrandbits(64))
+            self.position_keys[maze.size] = keys
+        cols = maze.cols
+        h = keys[0][ghost_pos[1] * cols + ghost_pos[0]] ^ keys[1][pacman_pos[1] * cols + pacman_pos[0]]
+        if maximizing:
+            h ^= keys[2]
+        return h ^ maze.layout_hash
+
+    def lookup(self, key, depth):
+        """(value, flag) searched to at least this depth, or None"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < depth:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def best_move(self, key):
+        """Best move stored for a position at any depth, used for move ordering"""
+        entry = self.entries.get(key)
+        return entry[3] if entry is not None else None
+
+    def store(self, key, depth, value, flag, best_move=None):
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > depth:
+                return  # Depth-preferred: keep the deeper result
+            self.entries.move_to_end(key)
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+        self.entries[key] = (depth, value, flag, best_move)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
+
+# Shared table for Clyde's searches
+minimax_table = TranspositionTable()
 
 def minimax_get_possible_moves(pos, maze):
-    """Get possible moves with caching"""
-    cache_key = (pos, tuple(map(tuple, maze)))
-    if cache_key in move_cache:
-        return move_cache[cache_key]
-        
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-    moves = []
-    for dx, dy in directions:
-        nx, ny = pos[0] + dx, pos[1] + dy
-        if 0 <= nx < len(maze[0]) and 0 <= ny < len(maze) and maze[ny][nx] != 1:
-            moves.append((nx, ny))
-    
-    move_cache[cache_key] = moves
-    return moves
+    """Get possible moves from the maze's precomputed neighbor table"""
+    return maze.open_neighbors(pos)
+
+class EvalFeatures:
+    """Per-maze feature planes read by minimax_evaluate.
+
+    Holds the walkable degree of every cell, true maze distances between
+    all cells, each cell's maze distance to the nearest corner, and the
+    escape-route count for every (ghost, Pac-Man) pair. These are combined
+    into one `score` matrix, so evaluating a leaf is a single array read.
+    Unreachable pairs count as `size` tiles apart.
+    """
+    def __init__(self, maze, distance_table=None):
+        if distance_table is None or distance_table.version != maze.version:
+            distance_table = DistanceTable(maze)
+        self.cols = maze.cols
+        self.layout_hash = maze.layout_hash
+        size = maze.size
+        neighbors = distance_table.neighbors
+        self.neighbors = neighbors  # Walkable neighbor ids per direction, -1 for walls
+
+        self.degree = (neighbors >= 0).sum(axis=1).astype(np.int32)
+        dist = distance_table.dist.astype(np.int32)
+        dist[dist == DistanceTable.UNREACHABLE] = size
+        self.dist = dist
+
+        # Corners are usually border walls, so measure to the open cell nearest each one
+        open_ids = np.flatnonzero(maze.passable)
+        self.corner_dist = np.zeros(size, dtype=np.int32)
+        if open_ids.size:
+            ys, xs = np.divmod(open_ids, self.cols)
+            corners = [(0, 0), (0, maze.rows - 1), (maze.cols - 1, 0), (maze.cols - 1, maze.rows - 1)]
+            corner_ids = [open_ids[np.argmin(np.abs(xs - cx) + np.abs(ys - cy))] for cx, cy in corners]
+            self.corner_dist = dist[:, corner_ids].min(axis=1)
+
+        # escape[g, p]: Pac-Man's exits that the ghost at g is closer to than Pac-Man itself
+        escape = np.zeros((size, size), dtype=np.int32)
+        for k in range(neighbors.shape[1]):
+            hop = neighbors[:, k]
+            valid = hop >= 0
+            escape += valid[None, :] & (dist[:, np.where(valid, hop, 0)] < dist)
+        self.escape = escape
+
+        # Same weights as the old Manhattan evaluation
+        self.score = (-dist * 2 + (4 - escape) * 30
+                      + self.degree[:, None] * 5 - self.degree[None, :] * 5
+                      - self.corner_dist[:, None] * 3)
+
+    def evaluate(self, ghost_pos, pacman_pos):
+        cols = self.cols
+        return int(self.score[ghost_pos[1] * cols + ghost_pos[0], pacman_pos[1] * cols + pacman_pos[0]])
+
+# Feature planes by maze layout hash; only a few layouts are ever live at once
+_eval_features = {}
+
+def eval_features(maze, distance_table=None):
+    """EvalFeatures for the maze's current layout, built on first use"""
+    features = _eval_features.get(maze.layout_hash)
+    if features is None:
+        if len(_eval_features) >= 4:
+            _eval_features.clear()
+        features = EvalFeatures(maze, distance_table)
+        _eval_features[maze.layout_hash] = features
+    return features
 
 def minimax_evaluate(ghost_pos, pacman_pos, maze):
-    """Optimized evaluation function without A* calls"""
-    # Calculate Manhattan distance
-    manhattan_dist = abs(ghost_pos[0] - pacman_pos[0]) + abs(ghost_pos[1] - pacman_pos[1])
-    
-    # Calculate number of possible moves for ghost and Pacman
-    ghost_moves = len(minimax_get_possible_moves(ghost_pos, maze))
-    pacman_moves = len(minimax_get_possible_moves(pacman_pos, maze))
-    
-    # Calculate distance to nearest corner
-    corners = [(0, 0), (0, len(maze)-1), (len(maze[0])-1, 0), (len(maze[0])-1, len(maze)-1)]
-    corner_dist = min(abs(ghost_pos[0] - c[0]) + abs(ghost_pos[1] - c[1]) for c in corners)
-    
-    # Calculate if ghost is cutting off Pacman's escape routes
-    escape_routes = 0
-    for dx, dy in [(0,1), (1,0), (0,-1), (-1,0)]:
-        nx, ny = pacman_pos[0] + dx, pacman_pos[1] + dy
-        if 0 <= nx < len(maze[0]) and 0 <= ny < len(maze) and maze[ny][nx] != 1:
-            ghost_to_route = abs(ghost_pos[0] - nx) + abs(ghost_pos[1] - ny)
-            if ghost_to_route < manhattan_dist:
-                escape_routes += 1
-    
-    # Combine factors for evaluation
-    score = -manhattan_dist * 2  # Higher weight for distance
-    score += (4 - escape_routes) * 30  # Bonus for cutting off escape routes
-    score += ghost_moves * 5  # Bonus for having more options
-    score -= pacman_moves * 5  # Penalty for Pacman having more options
-    score -= corner_dist * 3  # Penalty for being far from corners
-    
-    return score
+    """Score a position from the precomputed feature planes (true maze distances)"""
+    return eval_features(maze).evaluate(ghost_pos, pacman_pos)
+
+class SearchTimeout(Exception):
+    """Raised inside minimax_search when the deadline passes"""
+    pass
+
+def _order_moves(moves, first):
+    """Put the previous iteration's best move in front, keeping the rest in order"""
+    if first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    return moves
+
+def minimax_search(ghost_pos, pacman_pos, maze, depth, alpha, beta, maximizing, deadline, stats=None):
+    """Alpha-beta search to a fixed depth; raises SearchTimeout past the deadline"""
+    if time.perf_counter() > deadline:
+        raise SearchTimeout()
+    if stats is not None:
+        stats['nodes'] = stats.get('nodes', 0) + 1
 
-def minimax_search(ghost_pos, pacman_pos, maze, depth, alpha, beta, maximizing, start_time, time_limit=0.05):
-    """Minimax search with time limit and move ordering"""
-    # Check time limit
-    if time.time() - start_time > time_limit:
-        return minimax_evaluate(ghost_pos, pacman_pos, maze)
-        
     if depth == 0:
         return minimax_evaluate(ghost_pos, pacman_pos, maze)
 
-    # Cache key
-    cache_key = (ghost_pos, pacman_pos, depth, maximizing)
-    if cache_key in minimax_cache:
-        return minimax_cache[cache_key]
+    # Transposition table lookup, narrowing the window with stored bounds
+    alpha_orig, beta_orig = alpha, beta
+    cache_key = minimax_table.key(ghost_pos, pacman_pos, maximizing, maze)
+    entry = minimax_table.lookup(cache_key, depth)
+    if entry is not None:
+        value, flag = entry
+        if flag == TranspositionTable.EXACT:
+            return value
+        if flag == TranspositionTable.LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if beta <= alpha:
+            return value
+    pv_move = minimax_table.best_move(cache_key)
+    best_move = None
 
     if maximizing:
         max_eval = -float('inf')
-        # Get and sort moves by evaluation
+        # Sort moves by evaluation, with the stored best line tried first
         moves = minimax_get_possible_moves(ghost_pos, maze)
         moves.sort(key=lambda m: minimax_evaluate(m, pacman_pos, maze), reverse=True)
         
-        for move in moves:
-            if maze[move[1]][move[0]] != 1:  # Check walkability
-                eval = minimax_search(move, pacman_pos, maze, depth - 1, alpha, beta, False, start_time, time_limit)
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-        minimax_cache[cache_key] = max_eval
-        return max_eval
+        for move in _order_moves(moves, pv_move):
+            eval = minimax_search(move, pacman_pos, maze, depth - 1, alpha, beta, False, deadline, stats)
+            if eval > max_eval:
+                max_eval, best_move = eval, move
+            alpha = max(alpha, eval)
+            if beta <= alpha:
+                break
+        best = max_eval
     else:
         min_eval = float('inf')
-        # Get and sort moves by evaluation
+        # Sort moves by evaluation, with the stored best line tried first
         moves = minimax_get_possible_moves(pacman_pos, maze)
         moves.sort(key=lambda m: minimax_evaluate(ghost_pos, m, maze))
         
-        for move in moves:
-            if maze[move[1]][move[0]] != 1:  # Check walkability
-                eval = minimax_search(ghost_pos, move, maze, depth - 1, alpha, beta, True, start_time, time_limit)
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-        minimax_cache[cache_key] = min_eval
-        return min_eval
+        for move in _order_moves(moves, pv_move):
+            eval = minimax_search(ghost_pos, move, maze, depth - 1, alpha, beta, True, deadline, stats)
+            if eval < min_eval:
+                min_eval, best_move = eval, move
+            beta = min(beta, eval)
+            if beta <= alpha:
+                break
+        best = min_eval
 
-def minimax_choose_move(current_pos, pacman_pos, maze, depth=3):
-    """Choose the best move using minimax with time limit and caching"""
-    start_time = time.time()
-    best_score = -float('inf')
+    # Only searches that finished reach this point, so the value is safe to keep
+    if best <= alpha_orig:
+        flag = TranspositionTable.UPPER
+    elif best >= beta_orig:
+        flag = TranspositionTable.LOWER
+    else:
+        flag = TranspositionTable.EXACT
+    minimax_table.store(cache_key, depth, best, flag, best_move)
+    return best
+
+def minimax_choose_move(current_pos, pacman_pos, maze, max_depth=12, time_limit=0.05, stats=None):
+    """Choose the best move with iterative deepening until the time limit.
+
+    Each depth is searched fully with the previous depth's best move tried
+    first, and the move from the last completed depth is returned. The depth
+    reached is recorded in stats['depth'] (0 when only the static ordering
+    was used).
+    """
+    deadline = time.perf_counter() + time_limit
     best_move = current_pos
     
     # Get all possible moves
@@ -180,105 +721,643 @@ def minimax_choose_move(current_pos, pacman_pos, maze, depth=3):
         minimax_choose_move.last_pos = current_pos
     
     walkable_moves = [move for move in possible_moves 
-                     if maze[move[1]][move[0]] != 1 and 
-                     move != minimax_choose_move.last_pos]
+                     if move != minimax_choose_move.last_pos]
     
+    if stats is not None:
+        stats['depth'] = 0
     if not walkable_moves:
         return current_pos
         
-    # Sort moves by initial evaluation for better pruning
+    # Sort moves by initial evaluation; this is the answer if depth 1 never finishes
     walkable_moves.sort(key=lambda m: minimax_evaluate(m, pacman_pos, maze), reverse=True)
+    best_move = walkable_moves[0]
     
-    # Evaluate each move
-    for move in walkable_moves:
-        score = minimax_search(move, pacman_pos, maze, depth - 1, -float('inf'), float('inf'), False, start_time)
-        if score > best_score:
-            best_score = score
-            best_move = move
+    for depth in range(1, max_depth + 1):
+        try:
+            iteration_best = None
+            best_score = -float('inf')
+            for move in _order_moves(walkable_moves, best_move):
+                score = minimax_search(move, pacman_pos, maze, depth - 1, best_score, float('inf'),
+                                       False, deadline, stats)
+                if score > best_score:
+                    best_score = score
+                    iteration_best = move
+        except SearchTimeout:
+            break
+        best_move = iteration_best
+        if stats is not None:
+            stats['depth'] = depth
     
     # Update last position
     minimax_choose_move.last_pos = current_pos
-            
-    # Clear old cache entries periodically
-    if len(minimax_cache) > 1000:
-        minimax_cache.clear()
-    if len(move_cache) > 1000:
-        move_cache.clear()
         
     return best_move
 
 
+# --- Team Search for all ghosts ---
+class TeamPlanner:
+    """Joint alpha-beta search for every free ghost against both Pac-Men.
+
+    Ghosts move together (one max ply over joint moves) and the Pac-Men
+    move together (one min ply). To keep the branching factor in check:
+    - a ghost's move is dropped when another of its moves is at least as
+      close to every Pac-Man and strictly closer to one (dominated);
+    - each ghost keeps at most `moves_per_ghost` moves;
+    - joint moves that only swap interchangeable ghosts, or stack two
+      ghosts on one tile when they could spread out, are pruned.
+    Positions are scored from the shared EvalFeatures planes, and a
+    transposition table stores values and best joint moves for ordering.
+
+    update() runs once per tick, like FlowFields. It replans only when
+    some position changed, and it stays within `time_limit` by iterative
+    deepening. Ghosts then read their own step with move_for().
+    """
+    CATCH = 10000
+
+    def __init__(self, time_limit=0.01, max_depth=8, moves_per_ghost=3):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.moves_per_ghost = moves_per_ghost
+        self.table = TranspositionTable(20000)
+        self.stats = {'plans': 0, 'depth': 0, 'nodes': 0, 'pruned': 0}
+        self.state = None
+        self.plan = {}
+
+    def update(self, ghost_positions, pacman_positions, maze, time_limit=None):
+        """Replan when any position or the maze changed.
+
+        ghost_positions maps ghost id -> tile for the ghosts taking part;
+        pacman_positions lists the tiles of the live Pac-Men. time_limit,
+        e.g. what is left of a frame budget, cuts the search time further.
+        """
+        pacmen = [p for p in pacman_positions if maze.is_open(p[0], p[1])]
+        ghosts = [(gid, pos) for gid, pos in sorted(ghost_positions.items()) if maze.is_open(pos[0], pos[1])]
+        state = (tuple(ghosts), tuple(pacmen), maze.layout_hash)
+        if state == self.state:
+            return
+        self.state = state
+        self.plan = {}
+        if not ghosts or not pacmen:
+            return
+        moves = self.search([maze.cell_id(*pos) for _, pos in ghosts],
+                            [maze.cell_id(*p) for p in pacmen], maze, time_limit)
+        self.plan = {gid: (pos, maze.position(move)) for (gid, pos), move in zip(ghosts, moves)}
+
+    def move_for(self, ghost_id, current_pos):
+        """Planned next tile for a ghost, or None if it is not in the plan or has moved since"""
+        planned = self.plan.get(ghost_id)
+        if planned is None or planned[0] != current_pos:
+            return None
+        return planned[1]
+
+    def search(self, ghosts, pacmen, maze, time_limit=None):
+        """Joint ghost move (cell ids, in the order given) from the deepest finished depth"""
+        self.features = eval_features(maze)
+        self.maze = maze
+        self.stats['plans'] += 1
+        if time_limit is not None:
+            time_limit = min(self.time_limit, max(0.001, time_limit))
+        deadline = time.perf_counter() + (self.time_limit if time_limit is None else time_limit)
+        root_moves = self._ghost_moves(ghosts, pacmen)
+        best = root_moves[0] if root_moves else tuple(ghosts)
+        self.stats['depth'] = 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                iteration_best = None
+                best_score = -float('inf')
+                for joint in _order_moves(root_moves, best):
+                    score = self._search(joint, pacmen, depth - 1, best_score, float('inf'), False, deadline)
+                    if score > best_score:
+                        best_score, iteration_best = score, joint
+            except SearchTimeout:
+                break
+            best = iteration_best
+            self.stats['depth'] = depth
+            if best_score >= self.CATCH:
+                break  # A forced catch will not get any better
+        return best
+
+    def _evaluate(self, ghosts, pacmen):
+        score = self.features.score
+        value = 0
+        for p in pacmen:
+            if p in ghosts:
+                value += self.CATCH
+            else:
+                value += max(int(score[g, p]) for g in ghosts)
+        return value
+
+    def _caught(self, ghosts, pacmen):
+        return any(p in ghosts for p in pacmen)
+
+    def _ghost_moves(self, ghosts, pacmen):
+        """Joint ghost moves after dominance and symmetry pruning, best first"""
+        dist = self.features.dist
+        per_ghost = []
+        for g in ghosts:
+            options = list(self.maze.neighbors[g]) or [g]
+            keep = [m for m in options
+                    if not any(all(dist[o, p] <= dist[m, p] for p in pacmen) and
+                               any(dist[o, p] < dist[m, p] for p in pacmen)
+                               for o in options if o != m)]
+            self.stats['pruned'] += len(options) - len(keep)
+            keep.sort(key=lambda m: min(dist[m, p] for p in pacmen))
+            per_ghost.append(keep[:self.moves_per_ghost])
+
+        joint_moves = []
+        seen = set()
+        for joint in _product(per_ghost):
+            canonical = tuple(sorted(joint))
+            if canonical in seen:
+                self.stats['pruned'] += 1
+                continue
+            seen.add(canonical)
+            joint_moves.append(joint)
+        # Stacked ghosts cover less ground; keep them only if nothing else exists
+        spread = [j for j in joint_moves if len(set(j)) == len(j)]
+        self.stats['pruned'] += len(joint_moves) - len(spread)
+        joint_moves = spread or joint_moves
+        joint_moves.sort(key=lambda j: self._evaluate(j, pacmen), reverse=True)
+        return joint_moves
+
+    def _pacman_moves(self, ghosts, pacmen):
+        """Joint Pac-Man moves (staying put allowed), worst for the ghosts first"""
+        per_pacman = [list(self.maze.neighbors[p]) + [p] for p in pacmen]
+        joint_moves = []
+        seen = set()
+        for joint in _product(per_pacman):
+            canonical = tuple(sorted(joint))
+            if canonical in seen:
+                self.stats['pruned'] += 1
+                continue
+            seen.add(canonical)
+            joint_moves.append(joint)
+        joint_moves.sort(key=lambda j: self._evaluate(ghosts, j))
+        return joint_moves
+
+    def _search(self, ghosts, pacmen, depth, alpha, beta, maximizing, deadline):
+        if time.perf_counter() > deadline:
+            raise SearchTimeout()
+        self.stats['nodes'] += 1
+        if depth == 0 or self._caught(ghosts, pacmen):
+            return self._evaluate(ghosts, pacmen)
+
+        alpha_orig, beta_orig = alpha, beta
+        key = (tuple(sorted(ghosts)), tuple(sorted(pacmen)), maximizing, self.maze.layout_hash)
+        entry = self.table.lookup(key, depth)
+        if entry is not None:
+            value, flag = entry
+            if flag == TranspositionTable.EXACT:
+                return value
+            if flag == TranspositionTable.LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if beta <= alpha:
+                return value
+        pv_move = self.table.best_move(key)
+        best_move = None
+
+        if maximizing:
+            best = -float('inf')
+            for joint in _order_moves(self._ghost_moves(ghosts, pacmen), pv_move):
+                value = self._search(joint, pacmen, depth - 1, alpha, beta, False, deadline)
+                if value > best:
+                    best, best_move = value, joint
+                alpha = max(alpha, value)
+                if beta <= alpha:
+                    break
+        else:
+            best = float('inf')
+            for joint in _order_moves(self._pacman_moves(ghosts, pacmen), pv_move):
+                value = self._search(ghosts, joint, depth - 1, alpha, beta, True, deadline)
+                if value < best:
+                    best, best_move = value, joint
+                beta = min(beta, value)
+                if beta <= alpha:
+                    break
+
+        if best <= alpha_orig:
+            flag = TranspositionTable.UPPER
+        elif best >= beta_orig:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self.table.store(key, depth, best, flag, best_move)
+        return best
+
+def _product(choices):
+    """Cartesian product of per-agent move lists, as tuples"""
+    joint = [()]
+    for options in choices:
+        joint = [prefix + (move,) for prefix in joint for move in options]
+    return joint
+
+
+# --- Monte Carlo Tree Search ---
+class MCTSNode:
+    """One (ghost, Pac-Man, side to move) state; value is the ghost's summed reward"""
+    __slots__ = ('ghost', 'pacman', 'ghost_to_move', 'children', 'untried', 'visits', 'value')
+
+    def __init__(self, ghost, pacman, ghost_to_move, moves):
+        self.ghost = ghost
+        self.pacman = pacman
+        self.ghost_to_move = ghost_to_move
+        self.children = {}
+        self.untried = [] if ghost == pacman else list(moves)
+        self.visits = 0
+        self.value = 0.0
+
+class MCTSPlanner:
+    """Monte Carlo tree search for one ghost chasing one Pac-Man.
+
+    Runs until either `rollouts` simulations or `time_limit` seconds are
+    used, whichever limit is set (rollouts wins when both are). Each
+    expanded leaf is scored by `batch_size` random playouts simulated
+    together as NumPy arrays of cell ids. The chosen child becomes the
+    next root, so when the real Pac-Man move matches one of its children
+    the statistics carry over to the next decision.
+    """
+    def __init__(self, maze, time_limit=0.02, rollouts=None, batch_size=32,
+                 rollout_depth=24, exploration=0.5, seed=None):
+        self.time_limit = time_limit
+        self.rollouts = rollouts
+        self.batch_size = batch_size
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.rng = np.random.default_rng(seed)
+        self.stats = {'decisions': 0, 'rollouts': 0, 'nodes': 0, 'reused': 0}
+        self.set_maze(maze)
+
+    def set_maze(self, maze):
+        """Switch to another maze, dropping the tree"""
+        self.maze = maze
+        self.layout_hash = maze.layout_hash
+        self.root = None
+
+    def choose_move(self, ghost_pos, pacman_pos):
+        """Ghost move with the best mean reward, or ghost_pos if it cannot move"""
+        maze = self.maze
+        if maze.layout_hash != self.layout_hash:
+            self.set_maze(maze)
+        if not (maze.in_bounds(*ghost_pos) and maze.in_bounds(*pacman_pos)):
+            return ghost_pos
+        features = eval_features(maze)
+        self.dist, self.neighbors = features.dist, features.neighbors
+        self.dist_scale = float(maze.rows + maze.cols)
+        self.stats['decisions'] += 1
+
+        ghost, pacman = maze.cell_id(*ghost_pos), maze.cell_id(*pacman_pos)
+        self.root = self._reuse_root(ghost, pacman)
+        if not self.root.untried and not self.root.children:
+            return ghost_pos
+
+        deadline = time.perf_counter() + self.time_limit
+        done = 0
+        while True:
+            done += self._iterate()
+            if self.rollouts is not None:
+                if done >= self.rollouts:
+                    break
+            elif time.perf_counter() > deadline:
+                break
+
+        move, child = max(self.root.children.items(),
+                          key=lambda item: (item[1].value / item[1].visits, item[1].visits))
+        self.root = child
+        return maze.position(move)
+
+    def _reuse_root(self, ghost, pacman):
+        root = self.root
+        if root is not None:
+            if not root.ghost_to_move and root.ghost == ghost and pacman in root.children:
+                self.stats['reused'] += 1
+                return root.children[pacman]
+            if root.ghost_to_move and root.ghost == ghost and root.pacman == pacman:
+                self.stats['reused'] += 1
+                return root
+        return self._node(ghost, pacman, True)
+
+    def _node(self, ghost, pacman, ghost_to_move):
+        self.stats['nodes'] += 1
+        mover = ghost if ghost_to_move else pacman
+        return MCTSNode(ghost, pacman, ghost_to_move, self.maze.neighbors[mover])
+
+    def _iterate(self):
+        """One select / expand / batched simulate / backpropagate pass"""
+        node = self.root
+        path = [node]
+        while not node.untried and node.children:
+            node = self._select(node)
+            path.append(node)
+        if node.untried:
+            move = node.untried.pop()
+            if node.ghost_to_move:
+                child = self._node(move, node.pacman, False)
+            else:
+                child = self._node(node.ghost, move, True)
+            node.children[move] = child
+            node = child
+            path.append(node)
+
+        if node.ghost == node.pacman:
+            count, total = 1, 1.0  # Caught
+        else:
+            rewards = self._rollouts(node.ghost, node.pacman, node.ghost_to_move, self.batch_size)
+            count, total = len(rewards), float(rewards.sum())
+        for visited in path:
+            visited.visits += count
+            visited.value += total
+        self.stats['rollouts'] += count
+        return count
+
+    def _select(self, node):
+        """UCT child; Pac-Man nodes pick the child that is worst for the ghost"""
+        log_visits = np.log(node.visits)
+        best, best_score = None, -float('inf')
+        for child in node.children.values():
+            mean = child.value / child.visits
+            if not node.ghost_to_move:
+                mean = 1.0 - mean
+            score = mean + self.exploration * (log_visits / child.visits) ** 0.5
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _rollouts(self, ghost, pacman, ghost_to_move, count):
+        """Rewards in [0, 1] for `count` playouts run side by side.
+
+        Both sides move greedily (ghost closer, Pac-Man farther by maze
+        distance) 70% of the time and randomly otherwise. A catch scores
+        between 0.5 and 1 depending on how soon it happens; otherwise the
+        final distance scores between 0 and 0.5.
+        """
+        rng, dist, neighbors = self.rng, self.dist, self.neighbors
+        g = np.full(count, ghost, dtype=np.int64)
+        p = np.full(count, pacman, dtype=np.int64)
+        caught_at = np.full(count, -1)
+        rows = np.arange(count)
+        depth = self.rollout_depth
+        for step in range(depth):
+            running = caught_at < 0
+            if not running.any():
+                break
+            movers, other = (g, p) if ghost_to_move else (p, g)
+            options = neighbors[movers]
+            valid = options >= 0
+            safe = np.where(valid, options, 0)
+            # Greedy choice by maze distance to the other side
+            away = dist[safe, other[:, None]].astype(np.float64)
+            if ghost_to_move:
+                greedy_key = np.where(valid, -away, -np.inf)
+            else:
+                greedy_key = np.where(valid, away, -np.inf)
+            random_key = np.where(valid, rng.random(options.shape), -np.inf)
+            use_greedy = rng.random(count) < 0.7
+            pick = np.where(use_greedy, greedy_key.argmax(axis=1), random_key.argmax(axis=1))
+            moved = options[rows, pick]
+            step_to = np.where(running & (moved >= 0), moved, movers)
+            if ghost_to_move:
+                g = step_to
+            else:
+                p = step_to
+            caught_at[(caught_at < 0) & (g == p)] = step
+            ghost_to_move = not ghost_to_move
+
+        final = np.minimum(dist[g, p], self.dist_scale) / self.dist_scale
+        return np.where(caught_at >= 0, 1.0 - caught_at / (2.0 * depth), 0.5 * (1.0 - final))
+
+
 # --- Genetic Algorithm for Inky ---
 DIRECTIONS = ['up', 'down', 'left', 'right']
+# (dx, dy) per direction code; genomes store indexes into DIRECTIONS
+DIRECTION_DELTAS = np.array([(0, -1), (0, 1), (-1, 0), (1, 0)], dtype=np.int64)
 
-class GhostDNA:
-    def __init__(self, gene_length=10):
-        self.genes = [random.choice(DIRECTIONS) for _ in range(gene_length)]
-        self.fitness = 0
-
-    def crossover(self, partner):
-        child = GhostDNA(len(self.genes))
-        midpoint = random.randint(0, len(self.genes) - 1)
-        child.genes = self.genes[:midpoint] + partner.genes[midpoint:]
-        return child
+def encode_genes(genes):
+    """Direction names -> int8 codes"""
+    return np.array([DIRECTIONS.index(g) for g in genes], dtype=np.int8)
 
-    def mutate(self, mutation_rate=0.1):
-        for i in range(len(self.genes)):
-            if random.random() < mutation_rate:
-                self.genes[i] = random.choice(DIRECTIONS)
+def decode_genes(codes):
+    """int8 codes -> direction names"""
+    return [DIRECTIONS[c] for c in codes]
 
 class GeneticGhostAI:
-    def __init__(self, population_size=20, gene_length=10):
-        self.population = [GhostDNA(gene_length) for _ in range(population_size)]
+    """Genetic planner with the whole population stored as one int8 matrix.
+
+    `genomes` is (population_size, gene_length) with one direction code per
+    gene and `fitness` holds one score per row. evaluate() takes a function
+    that scores the whole matrix at once (see batch_fitness), and evolve()
+    does selection, crossover and mutation with array operations.
+
+    In game, advance() spreads that work over frames: each call scores a
+    few more rows within a microsecond budget and evolves once the whole
+    generation is scored. shift() drops the gene a move has just used, so
+    the population carries over to the next decision.
+    """
+    def __init__(self, population_size=20, gene_length=10, seed=None, selection='roulette'):
+        self.rng = np.random.default_rng(seed)
+        self.selection = selection  # Key of SELECTION_OPERATORS
+        self.genomes = self.rng.integers(0, len(DIRECTIONS), size=(population_size, gene_length), dtype=np.int8)
+        self.fitness = np.zeros(population_size)
         self.generation = 0
-        self.best = self.population[0]  # Initialize best with first individual
+        self.best = self.genomes[0].copy()  # Initialize best with first individual
+        self.best_fitness = 0.0
+        self.cursor = 0  # Rows of the current generation scored so far
 
     def evaluate(self, evaluate_fn):
-        for dna in self.population:
-            dna.fitness = evaluate_fn(dna.genes)
-        self.population.sort(key=lambda x: x.fitness, reverse=True)
-        self.best = self.population[0] if self.population else None
+        self.fitness = np.asarray(evaluate_fn(self.genomes), dtype=np.float64)
+        self.cursor = len(self.genomes)
+        self._rank()
+
+    def advance(self, evaluate_fn, budget_us, batch_size=4, mutation_rate=0.1):
+        """Score rows batch by batch until budget_us microseconds are used.
+
+        At least one batch is scored per call. Returns True if a generation
+        was completed (and evolved) during this call.
+        """
+        start = time.perf_counter()
+        deadline = start + budget_us / 1e6
+        count = len(self.genomes)
+        finished = False
+        batches = 0
+        while count:
+            batches += 1
+            end = min(self.cursor + batch_size, count)
+            self.fitness[self.cursor:end] = evaluate_fn(self.genomes[self.cursor:end])
+            self.cursor = end
+            if end == count:
+                self._rank()
+                self.evolve(mutation_rate)
+                finished = True
+            # Stop early rather than start a batch that would overrun the budget
+            now = time.perf_counter()
+            if now + (now - start) / batches > deadline:
+                break
+        return finished
+
+    def shift(self):
+        """Drop the first gene of every genome after it was played, appending a random one.
+
+        Scores from before the move no longer apply, so the generation is rescored.
+        """
+        length = self.genomes.shape[1]
+        if length == 0:
+            return
+        fresh = self.rng.integers(0, len(DIRECTIONS), size=len(self.genomes), dtype=np.int8)
+        self.genomes = np.concatenate([self.genomes[:, 1:], fresh[:, None]], axis=1)
+        self.best = np.append(self.best[1:], self.rng.integers(0, len(DIRECTIONS))).astype(np.int8)
+        self.cursor = 0
+
+    def _rank(self):
+        """Sort the scored generation best first"""
+        order = np.argsort(-self.fitness, kind='stable')
+        self.genomes = self.genomes[order]
+        self.fitness = self.fitness[order]
+        self.best = self.genomes[0].copy()
+        self.best_fitness = float(self.fitness[0])
 
     def evolve(self, mutation_rate=0.1):
-        if not self.population:
+        count, length = self.genomes.shape
+        if count == 0:
             return
-            
-        new_population = [self.best] if self.best else []  # Keep the best one if it exists
-        while len(new_population) < len(self.population):
-            parent1 = self.select()
-            parent2 = self.select()
-            child = parent1.crossover(parent2)
-            child.mutate(mutation_rate)
-            new_population.append(child)
-        self.population = new_population
+        children = count - 1  # Keep the best one
+        parents = self.select(2 * children)  # One set of weights for the whole generation
+        parent1 = self.genomes[parents[:children]]
+        parent2 = self.genomes[parents[children:]]
+        # Single-point crossover: genes before the midpoint come from parent1
+        midpoints = self.rng.integers(0, length, size=children)
+        child = np.where(np.arange(length) < midpoints[:, None], parent1, parent2)
+        mutate = self.rng.random(child.shape) < mutation_rate
+        child[mutate] = self.rng.integers(0, len(DIRECTIONS), size=int(mutate.sum()), dtype=np.int8)
+        self.genomes = np.concatenate([self.best[None, :], child])
+        self.cursor = 0
         self.generation += 1
 
-    def select(self):
-        total_fitness = sum(dna.fitness for dna in self.population)
-        if total_fitness == 0:
-            return random.choice(self.population)
-        pick = random.uniform(0, total_fitness)
-        current = 0
-        for dna in self.population:
-            current += dna.fitness
-            if current > pick:
-                return dna
+    def select(self, count):
+        """`count` parent row indexes using this planner's selection operator"""
+        return SELECTION_OPERATORS[self.selection](self.fitness, count, self.rng)
+
+# --- Selection operators ---
+# Each takes a fitness vector, a number of picks and a NumPy Generator and
+# returns row indexes. Weights are built once per call, and each pick is a
+# binary search (searchsorted) or a vectorized tournament.
+def _weighted_picks(weights, count, rng):
+    total = weights.sum()
+    if total <= 0:
+        return rng.integers(0, len(weights), size=count)
+    picks = rng.uniform(0, total, size=count)
+    index = np.searchsorted(np.cumsum(weights), picks, side='right')
+    return np.minimum(index, len(weights) - 1)
+
+def roulette_select(fitness, count, rng):
+    """Fitness-proportionate selection; negative scores are shifted so the worst weighs zero"""
+    fitness = np.asarray(fitness, dtype=np.float64)
+    if len(fitness) and fitness.min() < 0:
+        fitness = fitness - fitness.min()
+    return _weighted_picks(fitness, count, rng)
+
+def rank_select(fitness, count, rng):
+    """Linear rank selection: the worst row weighs 1, the best weighs n"""
+    ranks = np.empty(len(fitness))
+    ranks[np.argsort(fitness, kind='stable')] = np.arange(1, len(fitness) + 1)
+    return _weighted_picks(ranks, count, rng)
+
+def tournament_select(fitness, count, rng, size=3):
+    """Best of `size` random rows, for each of `count` picks"""
+    fitness = np.asarray(fitness)
+    contenders = rng.integers(0, len(fitness), size=(count, size))
+    return contenders[np.arange(count), fitness[contenders].argmax(axis=1)]
+
+SELECTION_OPERATORS = {
+    'roulette': roulette_select,
+    'rank': rank_select,
+    'tournament': tournament_select,
+}
+
+# Move tables by maze layout hash, for batch_fitness
+_move_tables = {}
+
+def move_table(maze):
+    """(size, 4) cell id reached from each cell by each direction code.
+
+    Uses the player rule of calculate_fitness: a move only succeeds onto a
+    PATH tile, otherwise the ghost stays where it is.
+    """
+    table = _move_tables.get(maze.layout_hash)
+    if table is None:
+        if len(_move_tables) >= 4:
+            _move_tables.clear()
+        cells = np.arange(maze.size)
+        ys, xs = np.divmod(cells, maze.cols)
+        is_path = (maze.as_array() == PATH).ravel()
+        table = np.empty((maze.size, len(DIRECTIONS)), dtype=np.int64)
+        for code, (dx, dy) in enumerate(DIRECTION_DELTAS):
+            nx, ny = xs + dx, ys + dy
+            inside = (nx >= 0) & (nx < maze.cols) & (ny >= 0) & (ny < maze.rows)
+            target = np.where(inside, ny * maze.cols + nx, 0)
+            table[:, code] = np.where(inside & is_path[target], target, cells)
+        _move_tables[maze.layout_hash] = table
+    return table
+
+def batch_fitness(genomes, ghost_pos, pacman_pos, maze):
+    """calculate_fitness for every row of an int8 genome matrix at once.
+
+    The per-step reward only depends on the cell reached, so it is computed
+    once per cell and each step is a table lookup. The same float operations
+    run in the same order, so each value matches calculate_fitness on the
+    decoded genes exactly.
+    """
+    genomes = np.asarray(genomes)
+    if not maze.in_bounds(ghost_pos[0], ghost_pos[1]):
+        return np.array([calculate_fitness(decode_genes(row), ghost_pos, pacman_pos, maze) for row in genomes])
+    count, length = genomes.shape
+    table = move_table(maze)
+    px, py = pacman_pos
+
+    # Reward approaching Pac-Man, and count escape routes the ghost is closer to
+    ys, xs = np.divmod(np.arange(maze.size), maze.cols)
+    distance = np.abs(xs - px) + np.abs(ys - py)
+    closeness = 1 / (distance + 1)
+    routes_cut = np.zeros(maze.size, dtype=np.int64)
+    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+        rx, ry = px + dx, py + dy
+        if maze.get(rx, ry) == PATH:
+            routes_cut += (np.abs(xs - rx) + np.abs(ys - ry)) < distance
+
+    cell = np.full(count, maze.cell_id(ghost_pos[0], ghost_pos[1]), dtype=np.int64)
+    score = np.zeros(count)
+    escape_routes_cut = np.zeros(count, dtype=np.int64)
+    for step in range(length):
+        moved_to = table[cell, genomes[:, step]]
+        score += closeness[moved_to]
+        escape_routes_cut += routes_cut[moved_to]
+        # Penalize moving back and forth (a blocked move leaves the ghost in place)
+        score[moved_to == cell] -= 0.5
+        cell = moved_to
+
+    # Add bonus for cutting off escape routes
+    score += escape_routes_cut * 2
+    return score
 
 # Fitness function for Inky
 def calculate_fitness(path, ghost_pos, pacman_pos, maze):
     score = 0
     x, y = ghost_pos
-    last_pos = (x, y)
     escape_routes_cut = 0
+    # Pac-Man's open neighbors are the same for every step
+    routes = [(pacman_pos[0] + dx, pacman_pos[1] + dy) for dx, dy in [(0,1), (1,0), (0,-1), (-1,0)]
+              if maze.get(pacman_pos[0] + dx, pacman_pos[1] + dy) == PATH]
     
     for direction in path:
-        if direction == 'up' and y > 0 and maze[y - 1][x] == 0:
+        last_pos = (x, y)
+        # Maze.get reads outside the grid as a wall, so no bounds checks needed
+        if direction == 'up' and maze.get(x, y - 1) == PATH:
             y -= 1
-        elif direction == 'down' and y < len(maze) - 1 and maze[y + 1][x] == 0:
+        elif direction == 'down' and maze.get(x, y + 1) == PATH:
             y += 1
-        elif direction == 'left' and x > 0 and maze[y][x - 1] == 0:
+        elif direction == 'left' and maze.get(x - 1, y) == PATH:
             x -= 1
-        elif direction == 'right' and x < len(maze[0]) - 1 and maze[y][x + 1] == 0:
+        elif direction == 'right' and maze.get(x + 1, y) == PATH:
             x += 1
             
         # Reward approaching Pac-Man
@@ -286,20 +1365,16 @@ def calculate_fitness(path, ghost_pos, pacman_pos, maze):
         score += 1 / (distance + 1)
         
         # Reward cutting off escape routes
-        for dx, dy in [(0,1), (1,0), (0,-1), (-1,0)]:
-            nx, ny = pacman_pos[0] + dx, pacman_pos[1] + dy
-            if 0 <= nx < len(maze[0]) and 0 <= ny < len(maze) and maze[ny][nx] == 0:
-                ghost_to_route = abs(x - nx) + abs(y - ny)
-                if ghost_to_route < distance:
-                    escape_routes_cut += 1
+        for nx, ny in routes:
+            ghost_to_route = abs(x - nx) + abs(y - ny)
+            if ghost_to_route < distance:
+                escape_routes_cut += 1
         
         # Penalize moving back and forth
         if (x, y) == last_pos:
             score -= 0.5
-            
-        last_pos = (x, y)
-    
+
     # Add bonus for cutting off escape routes
     score += escape_routes_cut * 2
     
-    return score
\ No newline at end of file
+    return score
@@ -5,14 +5,26 @@ sprite_sheet = None
 pacman_right = []
 pacman2_right = []
 
-def load_sprite_sheet():
+# Frames already scaled to one tile, per tile size
+_atlases = {}
+
+def load_sprite_sheet(tile_size=None):
+    """Pac-Man, second Pac-Man and ghost frames by direction.
+
+    With tile_size, every frame is scaled straight to tile_size x tile_size
+    here, once per size, and the result is shared, so drawing only blits.
+    Without it, frames keep the sheet's 0.7 scale.
+    """
     global sprite_sheet
-    # Get the directory where the script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    # Construct the full path to spritesheet.png
-    spritesheet_path = os.path.join(script_dir, "spritesheet.png")
-    sprite_sheet = pygame.image.load(spritesheet_path).convert()
-    sprite_sheet.set_colorkey((255, 0, 255))  # Magenta transparency
+    if tile_size in _atlases:
+        return _atlases[tile_size]
+    if sprite_sheet is None:
+        # Get the directory where the script is located
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        # Construct the full path to spritesheet.png
+        spritesheet_path = os.path.join(script_dir, "spritesheet.png")
+        sprite_sheet = pygame.image.load(spritesheet_path).convert()
+        sprite_sheet.set_colorkey((255, 0, 255))  # Magenta transparency
 
     directions = ['right', 'left', 'up', 'down']
     sprites_by_direction = {}
@@ -23,7 +35,9 @@ def load_sprite_sheet():
         sprite.blit(sprite_sheet, (0, 0), (x, y, width, height))
         sprite.set_colorkey((255, 0, 255))
 
-        if scale != 1.0:
+        if tile_size is not None:
+            sprite = pygame.transform.scale(sprite, (tile_size, tile_size))
+        elif scale != 1.0:
             new_size = (int(width * scale), int(height * scale))
             sprite = pygame.transform.scale(sprite, new_size)
 
@@ -88,4 +102,5 @@ def load_sprite_sheet():
     }
 
     #return pacman_right, pacman2_right
-    return sprites_by_direction, sprites_by_direction_p2, ghosts
+    _atlases[tile_size] = (sprites_by_direction, sprites_by_direction_p2, ghosts)
+    return _atlases[tile_size]
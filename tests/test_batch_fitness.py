@@ -0,0 +1,29 @@
+"""batch_fitness must give exactly the scores of calculate_fitness."""
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maze import Maze, build_maze
+from search_agents import DIRECTIONS, batch_fitness, calculate_fitness, decode_genes
+
+
+def test_batch_fitness_matches_calculate_fitness():
+    rng = random.Random(0)
+    genome_rng = np.random.default_rng(0)
+    for _ in range(20):
+        maze = Maze(21, 21)
+        build_maze(maze, rng)
+        tiles = maze.open_tiles()
+        genomes = genome_rng.integers(0, len(DIRECTIONS), size=(150, 10), dtype=np.int8)
+        ghost_pos, pacman_pos = rng.choice(tiles), rng.choice(tiles)
+        expected = [calculate_fitness(decode_genes(row), ghost_pos, pacman_pos, maze) for row in genomes]
+        assert batch_fitness(genomes, ghost_pos, pacman_pos, maze).tolist() == expected
+
+
+if __name__ == "__main__":
+    test_batch_fitness_matches_calculate_fitness()
+    print("ok")
@@ -0,0 +1,53 @@
+"""bfs must return exactly the paths of the original list-copying implementation."""
+import os
+import random
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maze import Maze, PATH, WALL, build_maze
+from search_agents import bfs
+
+
+def reference_bfs(start, goal, grid):
+    """The original bfs, over a list of rows, kept as the reference"""
+    queue = deque([(start, [])])
+    visited = set([start])
+
+    while queue:
+        (x, y), path = queue.popleft()
+
+        if (x, y) == goal:
+            return path
+
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            nx, ny = x + dx, y + dy
+            if (0 <= nx < len(grid[0]) and 0 <= ny < len(grid) and
+                (nx, ny) not in visited and grid[ny][nx] != 1):
+                visited.add((nx, ny))
+                queue.append(((nx, ny), path + [(nx, ny)]))
+
+    return []
+
+
+def test_bfs_matches_reference_paths():
+    for seed in range(20):
+        rng = random.Random(seed)
+        maze = Maze(21, 21)
+        build_maze(maze, rng)
+        for _ in range(10):
+            # Knock out or add a few walls so unreachable goals come up too
+            for _ in range(5):
+                x, y = rng.randrange(21), rng.randrange(21)
+                maze.set(x, y, PATH if maze.get(x, y) == WALL else WALL)
+            grid = [[maze.get(x, y) for x in range(21)] for y in range(21)]
+            for _ in range(20):
+                start = rng.choice(maze.open_tiles())
+                goal = (rng.randrange(21), rng.randrange(21))
+                assert bfs(start, goal, maze) == reference_bfs(start, goal, grid), (seed, start, goal)
+
+
+if __name__ == "__main__":
+    test_bfs_matches_reference_paths()
+    print("ok")
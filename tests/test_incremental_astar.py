@@ -0,0 +1,43 @@
+"""Randomized check of IncrementalAStar against a fresh bfs on every plan."""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maze import Maze, PATH, WALL, build_maze
+from search_agents import IncrementalAStar, bfs
+
+
+def mismatches(seed, plans=400):
+    """Plans whose length differs from bfs while the chaser follows its path,
+    the target wanders and one random wall toggles before every plan"""
+    rng = random.Random(seed)
+    maze = Maze(21, 21)
+    build_maze(maze, rng)
+    planner = IncrementalAStar(maze)
+    start, goal = rng.choice(maze.open_tiles()), rng.choice(maze.open_tiles())
+    bad = 0
+    for _ in range(plans):
+        x, y = rng.randrange(1, 20), rng.randrange(1, 20)
+        maze.set(x, y, PATH if maze.get(x, y) == WALL else WALL)
+        goal = rng.choice(maze.open_neighbors(goal) or [goal])
+        if not maze.is_open(*start):
+            start = rng.choice(maze.open_tiles())
+        if not maze.is_open(*goal):
+            goal = rng.choice(maze.open_tiles())
+        path = planner.plan(start, goal)
+        bad += len(path) != len(bfs(start, goal, maze))
+        if path:
+            start = path[0]
+    return bad
+
+
+def test_paths_stay_shortest_under_wall_toggles():
+    # Seeds 11 and 170 hit the shortcut-through-a-new-opening case
+    assert sum(mismatches(seed) for seed in range(200)) == 0
+
+
+if __name__ == "__main__":
+    test_paths_stay_shortest_under_wall_toggles()
+    print("ok")
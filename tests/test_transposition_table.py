@@ -0,0 +1,25 @@
+"""Transposition table keys must not collide with maze layout changes."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maze import Maze, _zobrist_table
+from search_agents import TranspositionTable
+
+
+def test_position_moves_never_cancel_a_one_cell_layout_change():
+    maze = Maze(21, 21)
+    table = TranspositionTable()
+    table.key((1, 1), (1, 1), True, maze)
+    ghost_keys, pacman_keys, _ = table.position_keys[maze.size]
+    layout_changes = {keys[a] ^ keys[b] for keys in _zobrist_table(maze.size)
+                      for a in range(3) for b in range(3) if a != b}
+    for piece_keys in (ghost_keys, pacman_keys):
+        moves = {x ^ y for x in piece_keys for y in piece_keys if x != y}
+        assert not moves & layout_changes
+
+
+if __name__ == "__main__":
+    test_position_moves_never_cancel_a_one_cell_layout_change()
+    print("ok")
@@ -1,173 +1,325 @@
+"""Offline trainer for Inky's genetic planner.
+
+Generates mazes with the game's own generator, picks (ghost, Pac-Man) start
+pairs on each, and evolves one genome that scores well across all of them.
+Progress is checkpointed so long runs can be resumed after an interruption:
+
+    python train_genetic_algorithm.py --mazes 20 --pairs 8 --generations 500 \\
+        --workers 4 --checkpoint runs/inky.npz
+    python train_genetic_algorithm.py ... --checkpoint runs/inky.npz --resume
+"""
+import argparse
+import json
+import os
 import random
-from search_agents import GeneticGhostAI, calculate_fitness
-
-# Maze dimensions and layout (replace with your actual maze)
-ROWS, COLS = 21, 21
-maze = [[0 for _ in range(COLS)] for _ in range(ROWS)]  # Example maze
-
-# Ghost and Pac-Man positions
-ghost_pos = (10, 10)  # Replace with actual ghost position
-pacman_pos = (5, 5)   # Replace with actual Pac-Man position
-
-# Initialize GA
-genetic_ai = GeneticGhostAI(population_size=50, gene_length=20)
-
-# Train the GA
-for generation in range(100):  # Number of generations
-    def evaluate_fn(genes):
-        return calculate_fitness(genes, ghost_pos, pacman_pos, maze)
-
-    genetic_ai.evaluate(evaluate_fn)
-    genetic_ai.evolve(mutation_rate=0.1)
-
-    print(f"Generation {generation + 1}: Best Fitness = {genetic_ai.best.fitness}")
-
-# Save the best path
-best_path = []
-current_pos = ghost_pos
-for direction in genetic_ai.best.genes:
-    if direction == 'up' and current_pos[1] > 0 and maze[current_pos[1] - 1][current_pos[0]] == 0:
-        current_pos = (current_pos[0], current_pos[1] - 1)
-    elif direction == 'down' and current_pos[1] < len(maze) - 1 and maze[current_pos[1] + 1][current_pos[0]] == 0:
-        current_pos = (current_pos[0], current_pos[1] + 1)
-    elif direction == 'left' and current_pos[0] > 0 and maze[current_pos[1]][current_pos[0] - 1] == 0:
-        current_pos = (current_pos[0] - 1, current_pos[1])
-    elif direction == 'right' and current_pos[0] < len(maze[0]) - 1 and maze[current_pos[1]][current_pos[0] + 1] == 0:
-        current_pos = (current_pos[0] + 1, current_pos[1])
-    best_path.append(current_pos)
-
-# Save the trained path to a file
-with open("trained_clyde_path.txt", "w") as f:
-    f.write(str(best_path))
-
-def train_ghost_ai(ghost_id, maze, generations=100, population_size=50):
-    """Train ghost AI using genetic algorithm with enhanced parameters"""
-    # Initialize genetic algorithm with larger population and more generations
-    genetic_ai = GeneticGhostAI(population_size=population_size, gene_length=20)
-    
-    # Training parameters
-    mutation_rate = 0.2  # Increased mutation rate for more exploration
-    crossover_rate = 0.8  # High crossover rate for better solution sharing
-    
-    # Track best fitness for early stopping
-    best_fitness_history = []
-    no_improvement_count = 0
-    
-    print(f"Training Ghost {ghost_id} AI...")
-    
-    for generation in range(generations):
-        # Evaluate population
-        for individual in genetic_ai.population:
-            # Simulate ghost movement
-            x, y = 10, 10  # Starting position
-            pacman_pos = (15, 15)  # Example Pacman position
-            fitness = calculate_fitness(individual.genes, (x, y), pacman_pos, maze)
-            individual.fitness = fitness
-        
-        # Sort population by fitness
-        genetic_ai.population.sort(key=lambda x: x.fitness, reverse=True)
-        
-        # Track best fitness
-        best_fitness = genetic_ai.population[0].fitness
-        best_fitness_history.append(best_fitness)
-        
-        # Early stopping check
-        if len(best_fitness_history) > 10:
-            if best_fitness <= max(best_fitness_history[:-10]):
-                no_improvement_count += 1
-            else:
-                no_improvement_count = 0
-                
-            if no_improvement_count >= 20:  # Stop if no improvement for 20 generations
-                print(f"Early stopping at generation {generation}")
-                break
-        
-        # Create new population
-        new_population = []
-        
-        # Elitism: Keep best individuals
-        elite_count = int(population_size * 0.1)  # Keep top 10%
-        new_population.extend(genetic_ai.population[:elite_count])
-        
-        # Generate rest of population
-        while len(new_population) < population_size:
-            # Tournament selection
-            parent1 = tournament_selection(genetic_ai.population, tournament_size=5)
-            parent2 = tournament_selection(genetic_ai.population, tournament_size=5)
-            
-            # Crossover
-            if random.random() < crossover_rate:
-                child1, child2 = crossover(parent1, parent2)
-            else:
-                child1, child2 = parent1, parent2
-            
-            # Mutation with adaptive rate
-            if random.random() < mutation_rate:
-                mutate(child1)
-            if random.random() < mutation_rate:
-                mutate(child2)
-            
-            new_population.extend([child1, child2])
-        
-        genetic_ai.population = new_population[:population_size]
-        
-        # Print progress
-        if (generation + 1) % 10 == 0:
-            print(f"Generation {generation + 1}, Best Fitness: {best_fitness:.2f}")
-    
-    # Save best individual
-    best_individual = max(genetic_ai.population, key=lambda x: x.fitness)
-    with open(f"trained_ghost_{ghost_id}_path.txt", "w") as f:
-        f.write(str(best_individual.genes))
-    
-    print(f"Training completed for Ghost {ghost_id}")
-    print(f"Best fitness achieved: {best_individual.fitness:.2f}")
-    
-    return genetic_ai
-
-def tournament_selection(population, tournament_size=3):
-    """Tournament selection with variable tournament size"""
-    tournament = random.sample(population, tournament_size)
-    return max(tournament, key=lambda x: x.fitness)
-
-def crossover(parent1, parent2):
+import time
+from collections import OrderedDict
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from search_agents import GeneticGhostAI, DIRECTIONS, batch_fitness, tournament_select
+from maze import Maze, PATH, build_maze
+from policy import save_policy
+
+# --- Training scenarios ---
+def make_scenarios(num_mazes, pairs_per_maze, rows=21, cols=21, seed=None):
+    """Mazes from the game's generator, and (maze index, ghost start, Pac-Man start) triples"""
+    rng = random.Random(seed)
+    mazes, scenarios = [], []
+    for index in range(num_mazes):
+        maze = Maze(rows, cols)
+        build_maze(maze, rng)
+        open_tiles = [maze.position(cell) for cell in range(maze.size) if maze.cells[cell] == PATH]
+        for _ in range(pairs_per_maze):
+            ghost_pos, pacman_pos = rng.sample(open_tiles, 2)
+            scenarios.append((index, ghost_pos, pacman_pos))
+        mazes.append(maze)
+    return mazes, scenarios
+
+def evaluate_scenarios(genomes, mazes, scenarios):
+    """Mean batch_fitness of every genome over all scenarios"""
+    total = np.zeros(len(genomes))
+    for index, ghost_pos, pacman_pos in scenarios:
+        total += batch_fitness(genomes, ghost_pos, pacman_pos, mazes[index])
+    return total / len(scenarios)
+
+class FitnessMemo:
+    """Bounded memo of whole-genome scores in front of an evaluation function.
+
+    Fitness over a fixed scenario set is deterministic, and every generation
+    carries its elites and uncrossed parent copies over unchanged, so those
+    rows are looked up instead of being simulated again. Rows are scored
+    independently, so the values are identical to scoring everything. The
+    least recently used scores are dropped once `capacity` genomes are kept.
+    """
+    def __init__(self, evaluate, capacity=100000):
+        self.evaluate = evaluate
+        self.capacity = capacity
+        self.scores = OrderedDict()  # Genome bytes -> fitness
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, genomes):
+        keys = [row.tobytes() for row in genomes]
+        missing = {}  # Key -> first row holding it
+        for row, key in enumerate(keys):
+            if key in self.scores:
+                self.scores.move_to_end(key)
+                self.hits += 1
+            elif key not in missing:
+                missing[key] = row
+        self.misses += len(missing)
+        if missing:
+            fresh = self.evaluate(genomes[list(missing.values())])
+            self.scores.update(zip(missing, fresh))
+        fitness = np.array([self.scores[key] for key in keys])
+        while len(self.scores) > self.capacity:
+            self.scores.popitem(last=False)
+        return fitness
+
+# --- Parallel fitness evaluation ---
+# Set in each worker process by _init_worker
+_worker_shm = None
+_worker_mazes = None
+
+def _init_worker(shm_name, shapes):
+    """Attach the shared maze cells once per worker"""
+    global _worker_shm, _worker_mazes
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_mazes = []
+    offset = 0
+    for rows, cols in shapes:
+        _worker_mazes.append(Maze.from_buffer(rows, cols, _worker_shm.buf[offset:offset + rows * cols]))
+        offset += rows * cols
+
+def _evaluate_chunk(genomes, scenarios):
+    return evaluate_scenarios(genomes, _worker_mazes, scenarios)
+
+class ParallelEvaluator:
+    """Scores genome matrices with evaluate_scenarios on a pool of worker processes.
+
+    Every maze's cells are copied once into one shared memory block, and
+    each worker attaches to them read-only. Every call splits the population
+    into contiguous chunks and joins the results in order, so fitness values
+    are identical to a single-process run. Use it as a context manager, or
+    call close(), to stop the workers and free the shared block.
+    """
+    def __init__(self, mazes, workers=None, chunks_per_worker=2):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunks = self.workers * chunks_per_worker
+        total = sum(maze.size for maze in mazes)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, total))
+        offset = 0
+        for maze in mazes:
+            self.shm.buf[offset:offset + maze.size] = maze.cells
+            offset += maze.size
+        shapes = [(maze.rows, maze.cols) for maze in mazes]
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.shm.name, shapes))
+
+    def __call__(self, genomes, scenarios):
+        chunks = [c for c in np.array_split(genomes, min(self.chunks, len(genomes))) if len(c)]
+        results = self.pool.map(_evaluate_chunk, chunks, [scenarios] * len(chunks))
+        return np.concatenate(list(results))
+
+    def close(self):
+        self.pool.shutdown()
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --- Breeding operators ---
+def crossover(parent1, parent2, rng=random):
     """Enhanced crossover with multiple crossover points"""
-    if len(parent1.genes) != len(parent2.genes):
-        return parent1, parent2
-    
-    # Create two children
-    child1 = Individual(len(parent1.genes))
-    child2 = Individual(len(parent2.genes))
-    
+    if len(parent1) != len(parent2):
+        return parent1.copy(), parent2.copy()
+
     # Use multiple crossover points
-    num_points = random.randint(1, 3)  # Random number of crossover points
-    points = sorted(random.sample(range(len(parent1.genes)), num_points))
-    
-    # Perform crossover
-    for i in range(len(parent1.genes)):
-        if i in points:
-            parent1, parent2 = parent2, parent1  # Switch parents at crossover points
-        child1.genes[i] = parent1.genes[i]
-        child2.genes[i] = parent2.genes[i]
-    
+    num_points = rng.randint(1, 3)  # Random number of crossover points
+    points = sorted(rng.sample(range(len(parent1)), num_points))
+
+    # Switch parents at every crossover point
+    switched = np.zeros(len(parent1), dtype=bool)
+    for point in points:
+        switched[point:] = ~switched[point:]
+    child1 = np.where(switched, parent2, parent1)
+    child2 = np.where(switched, parent1, parent2)
+
     return child1, child2
 
-def mutate(individual):
-    """Enhanced mutation with multiple mutation types"""
-    mutation_type = random.random()
-    
+def mutate(genes, rng=random):
+    """Enhanced mutation with multiple mutation types, in place on a genome row"""
+    mutation_type = rng.random()
+
     if mutation_type < 0.3:  # Point mutation
         # Mutate a single gene
-        idx = random.randrange(len(individual.genes))
-        individual.genes[idx] = random.choice(DIRECTIONS)
-    
+        idx = rng.randrange(len(genes))
+        genes[idx] = rng.randrange(len(DIRECTIONS))
+
     elif mutation_type < 0.6:  # Swap mutation
         # Swap two random genes
-        idx1, idx2 = random.sample(range(len(individual.genes)), 2)
-        individual.genes[idx1], individual.genes[idx2] = individual.genes[idx2], individual.genes[idx1]
-    
+        idx1, idx2 = rng.sample(range(len(genes)), 2)
+        genes[idx1], genes[idx2] = genes[idx2], genes[idx1]
+
     else:  # Inversion mutation
         # Invert a random subsequence
-        start = random.randrange(len(individual.genes))
-        length = random.randrange(1, min(5, len(individual.genes) - start + 1))
-        individual.genes[start:start+length] = reversed(individual.genes[start:start+length])
\ No newline at end of file
+        start = rng.randrange(len(genes))
+        length = rng.randrange(1, min(5, len(genes) - start + 1))
+        genes[start:start+length] = genes[start:start+length][::-1].copy()
+
+def breed(genetic_ai, rng, crossover_rate=0.8, mutation_rate=0.2, elite_fraction=0.1):
+    """Next generation from a scored, sorted population: elites, then tournament children"""
+    population_size = len(genetic_ai.genomes)
+    elite_count = max(1, int(population_size * elite_fraction))
+    new_population = list(genetic_ai.genomes[:elite_count])
+
+    # Draw every parent pair with one tournament call
+    pairs = (population_size - elite_count + 1) // 2
+    parents = genetic_ai.genomes[tournament_select(genetic_ai.fitness, 2 * pairs, genetic_ai.rng, size=5)]
+    for parent1, parent2 in zip(parents[0::2], parents[1::2]):
+        if rng.random() < crossover_rate:
+            child1, child2 = crossover(parent1, parent2, rng)
+        else:
+            child1, child2 = parent1.copy(), parent2.copy()
+        if rng.random() < mutation_rate:
+            mutate(child1, rng)
+        if rng.random() < mutation_rate:
+            mutate(child2, rng)
+        new_population.extend([child1, child2])
+
+    genetic_ai.genomes = np.array(new_population[:population_size], dtype=np.int8)
+    genetic_ai.generation += 1
+
+# --- Checkpoints ---
+# Settings that must match for a checkpoint to be resumed
+CHECKPOINT_KEYS = ['mazes', 'pairs', 'rows', 'cols', 'population', 'genes', 'seed']
+
+def save_checkpoint(path, args, genetic_ai, rng, state):
+    """Write the next generation and all RNG state, atomically"""
+    data = {
+        'config': {key: getattr(args, key) for key in CHECKPOINT_KEYS},
+        'state': {key: value for key, value in state.items() if key != 'best_genome'},
+        'numpy_rng': genetic_ai.rng.bit_generator.state,
+        'python_rng': rng.getstate(),
+    }
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        np.savez(f, genomes=genetic_ai.genomes, best=state['best_genome'],
+                 meta=np.array(json.dumps(data)))
+    os.replace(temp, path)
+
+def load_checkpoint(path, args, genetic_ai, rng):
+    """Restore a checkpoint written by save_checkpoint; returns the saved state"""
+    with np.load(path) as f:
+        data = json.loads(str(f['meta']))
+        genetic_ai.genomes = f['genomes'].astype(np.int8)
+        best_genome = f['best'].astype(np.int8)
+    config = {key: getattr(args, key) for key in CHECKPOINT_KEYS}
+    if data['config'] != config:
+        raise ValueError(f"Checkpoint {path} was made with different settings: {data['config']}")
+    genetic_ai.rng.bit_generator.state = data['numpy_rng']
+    version, internal, gauss = data['python_rng']
+    rng.setstate((version, tuple(internal), gauss))
+    state = data['state']
+    state['best_genome'] = best_genome
+    genetic_ai.generation = state['generation']
+    return state
+
+# --- Training loop ---
+def train(args):
+    """Evolve a genome over all scenarios; returns (best genome, best fitness)"""
+    mazes, scenarios = make_scenarios(args.mazes, args.pairs, args.rows, args.cols, args.seed)
+    print(f"Training on {len(mazes)} mazes, {len(scenarios)} start pairs")
+
+    genetic_ai = GeneticGhostAI(population_size=args.population, gene_length=args.genes, seed=args.seed)
+    rng = random.Random(args.seed)
+    state = {'generation': 0, 'best_fitness': -float('inf'), 'stale': 0,
+             'best_genome': genetic_ai.genomes[0].copy()}
+    if args.resume and args.checkpoint and os.path.exists(args.checkpoint):
+        state = load_checkpoint(args.checkpoint, args, genetic_ai, rng)
+        print(f"Resumed from {args.checkpoint} at generation {state['generation']}")
+
+    evaluator = ParallelEvaluator(mazes, args.workers) if args.workers > 1 else None
+    if evaluator is not None:
+        evaluate = lambda genomes: evaluator(genomes, scenarios)
+    else:
+        evaluate = lambda genomes: evaluate_scenarios(genomes, mazes, scenarios)
+    memo = FitnessMemo(evaluate, args.memo_size) if args.memo_size > 0 else None
+    try:
+        while state['generation'] < args.generations:
+            started = time.perf_counter()
+            genetic_ai.evaluate(memo or evaluate)
+            elapsed = max(time.perf_counter() - started, 1e-9)
+
+            # Track the best genome seen and how long since it last improved
+            if genetic_ai.best_fitness > state['best_fitness'] + args.min_delta:
+                state['best_fitness'] = genetic_ai.best_fitness
+                state['best_genome'] = genetic_ai.best.copy()
+                state['stale'] = 0
+            else:
+                state['stale'] += 1
+
+            state['generation'] += 1
+            print(f"Generation {state['generation']}: best {genetic_ai.best_fitness:.3f} "
+                  f"mean {genetic_ai.fitness.mean():.3f} | "
+                  f"{len(genetic_ai.genomes) / elapsed:.0f} genomes/s, "
+                  f"{len(genetic_ai.genomes) * len(scenarios) / elapsed:.0f} simulations/s")
+
+            stop = args.patience and state['stale'] >= args.patience
+            breed(genetic_ai, rng, args.crossover_rate, args.mutation_rate, args.elite_fraction)
+            if args.checkpoint and (stop or state['generation'] % args.checkpoint_every == 0
+                                    or state['generation'] == args.generations):
+                save_checkpoint(args.checkpoint, args, genetic_ai, rng, state)
+            if stop:
+                print(f"Early stopping: no improvement for {args.patience} generations")
+                break
+    finally:
+        if evaluator is not None:
+            evaluator.close()
+    if memo is not None:
+        print(f"Fitness memo: {memo.hits} of {memo.hits + memo.misses} genomes looked up instead of simulated")
+
+    return state['best_genome'], state['best_fitness']
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train Inky's genetic planner on generated mazes.")
+    parser.add_argument('--mazes', type=int, default=10, help="number of generated mazes")
+    parser.add_argument('--pairs', type=int, default=8, help="(ghost, Pac-Man) start pairs per maze")
+    parser.add_argument('--rows', type=int, default=21)
+    parser.add_argument('--cols', type=int, default=21)
+    parser.add_argument('--population', type=int, default=100)
+    parser.add_argument('--genes', type=int, default=20, help="moves per genome")
+    parser.add_argument('--generations', type=int, default=200)
+    parser.add_argument('--mutation-rate', type=float, default=0.2)
+    parser.add_argument('--crossover-rate', type=float, default=0.8)
+    parser.add_argument('--elite-fraction', type=float, default=0.1)
+    parser.add_argument('--patience', type=int, default=30,
+                        help="stop after this many generations without improvement (0 = never)")
+    parser.add_argument('--min-delta', type=float, default=1e-6, help="smallest gain that counts as improvement")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes for fitness evaluation")
+    parser.add_argument('--memo-size', type=int, default=100000,
+                        help="genome scores kept so unchanged genomes are not scored again (0 = off)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', help="checkpoint file (.npz) to write")
+    parser.add_argument('--checkpoint-every', type=int, default=10)
+    parser.add_argument('--resume', action='store_true', help="continue from --checkpoint if it exists")
+    parser.add_argument('--output', default='policies/ghost_4.pmp', help="policy file for the best genes")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    best_genome, best_fitness = train(args)
+    save_policy(args.output, best_genome, ghost_id=4)
+    print(f"Best fitness achieved: {best_fitness:.3f}, policy written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()